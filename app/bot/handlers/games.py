@@ -1,6 +1,7 @@
 """
 Обработчики игр
 """
+import json
 import logging
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, Message
@@ -23,7 +24,7 @@ async def handle_game_selection(callback: CallbackQuery, state: FSMContext):
     
     if game_type in ["clicker", "reaction", "2048"]:
         # Для простых игр сразу показываем WebView
-        await start_simple_game(callback, game_type)
+        await start_simple_game(callback, game_type, state)
     else:
         # Для сложных игр показываем уровни сложности
         await callback.message.edit_text(
@@ -34,8 +35,10 @@ async def handle_game_selection(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-async def start_simple_game(callback: CallbackQuery, game_type: str):
+async def start_simple_game(callback: CallbackQuery, game_type: str, state: FSMContext):
     """Запустить простую игру"""
+    game_data = {}
+    
     if game_type == "clicker":
         game = ClickerGame()
         html_content = game.generate_webview_html()
@@ -50,7 +53,15 @@ async def start_simple_game(callback: CallbackQuery, game_type: str):
         
     elif game_type == "2048":
         game = Game2048()
-        html_content = game.generate_webview_html()
+        
+        # Seed и время старта нужны для проверки партии по ходам;
+        # клиент играет с тем же seed, встроенным в страницу
+        game_state = game.start_game()
+        html_content = game.generate_webview_html(game_state["seed"])
+        game_data = {
+            "seed": game_state["seed"],
+            "start_time": game_state["start_time"]
+        }
         title = "🧩 2048"
         description = "Используйте стрелки для перемещения плиток. Цель: получить плитку 2048!"
         
@@ -61,7 +72,8 @@ async def start_simple_game(callback: CallbackQuery, game_type: str):
     # Сохраняем информацию об игре в состоянии
     await state.update_data(
         game_type=game_type,
-        game_started=True
+        game_started=True,
+        **game_data
     )
     
     await callback.message.edit_text(
@@ -72,6 +84,39 @@ async def start_simple_game(callback: CallbackQuery, game_type: str):
     await callback.answer()
 
 
+@router.message(F.web_app_data)
+async def handle_web_app_data(message: Message, state: FSMContext):
+    """Обработчик результатов игры из WebApp"""
+    data = await state.get_data()
+    
+    try:
+        payload = json.loads(message.web_app_data.data)
+    except ValueError:
+        await message.answer("❌ Некорректные данные игры")
+        return
+    
+    if data.get("game_type") != "2048" or "seed" not in data:
+        await message.answer("❌ Игра не найдена. Начните новую игру")
+        return
+    
+    # Очки считаются только по переигранной на сервере партии
+    result = Game2048().process_results(data, str(payload.get("moves", "")))
+    
+    await state.update_data(game_started=False)
+    
+    if not result.is_valid:
+        await message.answer("❌ Результат игры не прошел проверку")
+        return
+    
+    await message.answer(
+        f"🧩 <b>Игра завершена!</b>\n\n"
+        f"🏆 Очки: {result.final_score}\n"
+        f"🔢 Максимальная плитка: {result.max_tile}\n"
+        f"👣 Ходов: {result.moves_count}",
+        reply_markup=get_main_menu_keyboard()
+    )
+
+
 @router.callback_query(F.data.startswith("game_difficulty_"))
 async def handle_difficulty_selection(callback: CallbackQuery, state: FSMContext):
     """Обработчик выбора сложности"""
@@ -17,6 +17,7 @@ from app.bot.keyboards import (
 )
 from app.services.user_service import UserService
 from app.services.payment_service import PaymentService
+from app.services.rating_index import rating_index
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -181,6 +182,10 @@ async def show_profile(message: Message, session: AsyncSession):
     verification_status = "✅ Верифицирован" if user.is_verified else "❌ Не верифицирован"
     premium_status = "⭐ Премиум" if user.is_premium else "🔒 Обычный"
     
+    # Место в глобальном рейтинге
+    rank = await rating_index.rank(user.id)
+    rank_text = f"{rank[0]} из {rank[1]} (топ {rank[0] / rank[1] * 100:.1f}%)" if rank else "—"
+    
     text = f"""
 👤 <b>Профиль пользователя</b>
 
@@ -192,6 +197,7 @@ async def show_profile(message: Message, session: AsyncSession):
 
 🏆 <b>Статистика:</b>
 • Рейтинг: {user.rating}
+• Место в рейтинге: {rank_text}
 • Игр сыграно: {user.games_played}
 • Игр выиграно: {user.games_won}
 • Турниров сыграно: {user.tournaments_played}
@@ -219,6 +225,10 @@ async def show_statistics(message: Message, session: AsyncSession):
     win_rate = (user.games_won / user.games_played * 100) if user.games_played > 0 else 0
     tournament_win_rate = (user.tournaments_won / user.tournaments_played * 100) if user.tournaments_played > 0 else 0
     
+    # Место в глобальном рейтинге
+    rank = await rating_index.rank(user.id)
+    rank_text = f"{rank[0]} из {rank[1]} (топ {rank[0] / rank[1] * 100:.1f}%)" if rank else "—"
+    
     text = f"""
 📊 <b>Ваша статистика</b>
 
@@ -238,6 +248,7 @@ async def show_statistics(message: Message, session: AsyncSession):
 • Чистый доход: {user.total_winnings - user.total_deposits:.2f} ₽
 
 🏅 <b>Рейтинг:</b> {user.rating}
+🥇 <b>Место:</b> {rank_text}
     """
     
     await message.answer(text)
@@ -3,14 +3,19 @@
 """
 import logging
 from aiogram import Router, F
+from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message, PreCheckoutQuery, SuccessfulPayment
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.bot.keyboards import get_payment_methods_keyboard, get_confirmation_keyboard, get_main_menu_keyboard
+from app.bot.keyboards import (
+    get_payment_methods_keyboard, get_confirmation_keyboard, get_main_menu_keyboard,
+    get_pagination_keyboard
+)
 from app.bot.states import PaymentStates, WithdrawalStates
 from app.services.user_service import UserService
-from app.services.payment_service import PaymentService
+from app.services.payment_service import PaymentService, run_withdrawal_payouts
+from app.services.ledger_service import LedgerService
 from app.config import settings
 
 router = Router()
@@ -145,7 +150,8 @@ async def process_telegram_stars_payment(message: Message, amount: float, sessio
     transaction = await payment_service.create_deposit_request(
         user_id=message.from_user.id,
         amount=amount,
-        payment_method="telegram_stars"
+        payment_method="telegram_stars",
+        idempotency_key=f"deposit:{message.chat.id}:{message.message_id}"
     )
     
     # Здесь должна быть интеграция с Telegram Stars API
@@ -175,7 +181,8 @@ async def process_card_payment(message: Message, amount: float, session: AsyncSe
     transaction = await payment_service.create_deposit_request(
         user_id=message.from_user.id,
         amount=amount,
-        payment_method="yookassa"
+        payment_method="yookassa",
+        idempotency_key=f"deposit:{message.chat.id}:{message.message_id}"
     )
     
     # Здесь должна быть интеграция с ЮKassa
@@ -202,7 +209,8 @@ async def process_crypto_payment(message: Message, amount: float, session: Async
     transaction = await payment_service.create_deposit_request(
         user_id=message.from_user.id,
         amount=amount,
-        payment_method="crypto_usdt"
+        payment_method="crypto_usdt",
+        idempotency_key=f"deposit:{message.chat.id}:{message.message_id}"
     )
     
     # Здесь должна быть интеграция с Binance Pay или другой криптоплатежной системой
@@ -314,7 +322,7 @@ async def handle_withdrawal_details(message: Message, state: FSMContext, session
     )
 
 
-@router.callback_query(F.data == "confirm_withdrawal")
+@router.callback_query(F.data == "confirm_withdrawal", flags={"rate_limit": (0.2, 2)})
 async def confirm_withdrawal(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Подтвердить вывод средств"""
     data = await state.get_data()
@@ -327,7 +335,9 @@ async def confirm_withdrawal(callback: CallbackQuery, state: FSMContext, session
         payment_details={
             "method": "bank_transfer",
             "details": data.get("payment_details")
-        }
+        },
+        # Повторное нажатие на то же подтверждение не создает вторую заявку
+        idempotency_key=f"withdrawal:{callback.message.chat.id}:{callback.message.message_id}"
     )
     
     if transaction:
@@ -362,7 +372,7 @@ async def cancel_withdrawal(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data == "transaction_history")
+@router.callback_query(F.data.startswith("transaction_history"))
 async def show_transaction_history(callback: CallbackQuery, session: AsyncSession):
     """Показать историю транзакций"""
     user_service = UserService(session)
@@ -372,30 +382,56 @@ async def show_transaction_history(callback: CallbackQuery, session: AsyncSessio
         await callback.answer("❌ Пользователь не найден")
         return
     
-    transactions = await user_service.get_recent_transactions(user.id, limit=10)
+    # Курсор страницы передается в callback_data
+    _, _, cursor = callback.data.partition(":")
     
-    if not transactions:
+    ledger = LedgerService(session)
+    page = await ledger.get_history(user.id, cursor=cursor or None, limit=10)
+    entries = page.items
+    
+    if not entries:
         text = "📋 <b>История транзакций пуста</b>\n\nУ вас пока нет операций."
     else:
         text = "📋 <b>Последние транзакции:</b>\n\n"
         
-        for transaction in transactions:
-            status_emoji = "✅" if transaction.status.value == "completed" else "⏳"
+        for entry in entries:
             type_emoji = {
                 "deposit": "💳",
                 "withdrawal": "💸", 
                 "tournament_fee": "🏆",
                 "prize": "🎁",
-                "referral_bonus": "🎁"
-            }.get(transaction.transaction_type.value, "💰")
+                "referral_bonus": "🎁",
+                "refund": "↩️"
+            }.get(entry.entry_type.value, "💰")
             
-            text += f"{status_emoji} {type_emoji} {transaction.amount} ₽\n"
-            text += f"   {transaction.description}\n"
-            text += f"   {transaction.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+            text += f"✅ {type_emoji} {entry.amount:+} ₽\n"
+            text += f"   {entry.description or ''}\n"
+            text += f"   {entry.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
     
     await callback.message.edit_text(
         text,
-        reply_markup=get_main_menu_keyboard()
+        reply_markup=get_pagination_keyboard(
+            "transaction_history", page.next_cursor, page.prev_cursor, "back_to_balance"
+        )
     )
     
     await callback.answer()
+
+
+@router.message(Command("process_withdrawals"))
+async def process_withdrawals(message: Message):
+    """Провести ожидающие выводы (только для администраторов)"""
+    if message.from_user.id not in settings.ADMIN_USER_IDS:
+        return
+    
+    await message.answer("⏳ Обрабатываю заявки на вывод...")
+    
+    completed, rejected = await run_withdrawal_payouts(
+        settings.WITHDRAWAL_BATCH_SIZE, settings.WITHDRAWAL_WORKERS
+    )
+    
+    await message.answer(
+        f"💸 <b>Выплаты обработаны</b>\n\n"
+        f"✅ Проведено: {completed}\n"
+        f"❌ Отклонено: {rejected}"
+    )
@@ -3,15 +3,18 @@
 """
 import logging
 from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.bot.keyboards import (
     get_tournament_types_keyboard, get_tournament_fees_keyboard,
-    get_tournament_join_keyboard, get_main_menu_keyboard
+    get_tournament_join_keyboard, get_main_menu_keyboard, get_pagination_keyboard
 )
 from app.bot.states import TournamentCreation
+from app.services.leaderboard import leaderboard
+from app.services.matchmaking import DUEL_FEES, DUEL_GAMES, matchmaker
 from app.services.tournament_service import TournamentService
 from app.services.user_service import UserService
 from app.database.models import GameType, TournamentType
@@ -268,7 +271,7 @@ async def cancel_tournament_creation(callback: CallbackQuery, state: FSMContext)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("join_tournament_"))
+@router.callback_query(F.data.startswith("join_tournament_"), flags={"rate_limit": (0.5, 3)})
 async def handle_join_tournament(callback: CallbackQuery, session: AsyncSession):
     """Обработчик участия в турнире"""
     try:
@@ -313,24 +316,138 @@ async def handle_join_tournament(callback: CallbackQuery, session: AsyncSession)
     await callback.answer()
 
 
+def format_active_tournaments(tournaments) -> str:
+    """Текст списка активных турниров"""
+    if not tournaments:
+        return "🏆 <b>Активных турниров нет</b>\n\nСоздайте новый турнир или дождитесь появления доступных соревнований."
+    
+    text = "🏆 <b>Активные турниры:</b>\n\n"
+    
+    for tournament in tournaments:
+        status_emoji = "🟢" if tournament.status.value == "registration" else "🟡"
+        
+        text += f"{status_emoji} <b>{tournament.title}</b>\n"
+        text += f"🎮 {tournament.game_type.value} • 💰 {tournament.entry_fee} ₽\n"
+        text += f"👥 {tournament.participant_count}/{tournament.max_participants} участников\n"
+        text += f"🏆 Призовой фонд: {tournament.prize_pool:.2f} ₽\n\n"
+    
+    return text
+
+
 @router.message(Command("tournaments"))
 async def show_active_tournaments(message: Message, session: AsyncSession):
     """Показать активные турниры"""
     tournament_service = TournamentService(session)
-    tournaments = await tournament_service.get_active_tournaments()
+    page = await tournament_service.get_active_tournaments_page(limit=10)
     
-    if not tournaments:
-        text = "🏆 <b>Активных турниров нет</b>\n\nСоздайте новый турнир или дождитесь появления доступных соревнований."
-    else:
-        text = "🏆 <b>Активные турниры:</b>\n\n"
-        
-        for tournament in tournaments[:10]:  # Показываем только первые 10
-            status_emoji = "🟢" if tournament.status.value == "registration" else "🟡"
-            participants_count = len(tournament.participants)
-            
-            text += f"{status_emoji} <b>{tournament.title}</b>\n"
-            text += f"🎮 {tournament.game_type.value} • 💰 {tournament.entry_fee} ₽\n"
-            text += f"👥 {participants_count}/{tournament.max_participants} участников\n"
-            text += f"🏆 Призовой фонд: {tournament.prize_pool:.2f} ₽\n\n"
+    await message.answer(
+        format_active_tournaments(page.items),
+        reply_markup=get_pagination_keyboard("active_tournaments", page.next_cursor, page.prev_cursor)
+    )
+
+
+@router.callback_query(F.data.startswith("active_tournaments:"))
+async def page_active_tournaments(callback: CallbackQuery, session: AsyncSession):
+    """Листание списка активных турниров"""
+    cursor = callback.data.split(":", 1)[1]
+    
+    tournament_service = TournamentService(session)
+    page = await tournament_service.get_active_tournaments_page(cursor=cursor, limit=10)
+    
+    await callback.message.edit_text(
+        format_active_tournaments(page.items),
+        reply_markup=get_pagination_keyboard("active_tournaments", page.next_cursor, page.prev_cursor)
+    )
+    await callback.answer()
+
+
+@router.message(Command("standings"), flags={"rate_limit": (0.5, 3)})
+async def show_standings(message: Message, command: CommandObject, session: AsyncSession):
+    """Текущая таблица результатов турнира: /standings <id турнира>"""
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("Укажите ID турнира: /standings 123")
+        return
+    
+    tournament_id = int(command.args.strip())
+    user_service = UserService(session)
+    user = await user_service.get_user_by_telegram_id(message.from_user.id)
+    
+    top = await leaderboard.top(tournament_id, limit=10)
+    if not top:
+        await message.answer("📊 Результатов по этому турниру пока нет")
+        return
+    
+    # Соседи игрока, если он не попал в первую десятку
+    neighbours = []
+    if user:
+        neighbours = [
+            row for row in await leaderboard.around(tournament_id, user.id)
+            if row[0] > top[-1][0]
+        ]
+    
+    names = await user_service.get_display_names(
+        [user_id for _, user_id, _ in top + neighbours]
+    )
+    
+    def format_row(position: int, user_id: int, score: float) -> str:
+        marker = "👉 " if user and user_id == user.id else ""
+        return f"{marker}{position}. {names.get(user_id, user_id)} — {score:g}\n"
+    
+    text = f"📊 <b>Турнир #{tournament_id}: текущие результаты</b>\n\n"
+    text += "".join(format_row(*row) for row in top)
+    
+    if neighbours:
+        text += "...\n" + "".join(format_row(*row) for row in neighbours)
     
     await message.answer(text)
+
+
+@router.message(Command("duel"), flags={"rate_limit": (0.2, 3)})
+async def find_duel(message: Message, command: CommandObject, session: AsyncSession):
+    """Встать в очередь подбора соперника: /duel <игра> <взнос>"""
+    args = (command.args or "").split()
+    
+    if len(args) != 2 or args[0] not in DUEL_GAMES or not args[1].isdigit() or int(args[1]) not in DUEL_FEES:
+        await message.answer(
+            "⚔️ <b>Быстрая дуэль</b>\n\n"
+            "Использование: /duel &lt;игра&gt; &lt;взнос&gt;\n"
+            f"🎮 Игры: {', '.join(DUEL_GAMES)}\n"
+            f"💰 Взносы: {', '.join(map(str, DUEL_FEES))} ₽\n\n"
+            "Например: /duel 2048 100"
+        )
+        return
+    
+    game, entry_fee = args[0], int(args[1])
+    
+    user_service = UserService(session)
+    user = await user_service.get_user_by_telegram_id(message.from_user.id)
+    
+    if not user:
+        await message.answer("❌ Пользователь не найден. Используйте /start")
+        return
+    
+    if user.balance < entry_fee:
+        await message.answer("❌ Недостаточно средств для взноса")
+        return
+    
+    if not await matchmaker.enqueue(user.id, user.rating, game, entry_fee):
+        await message.answer("⏳ Вы уже ищете соперника. Отменить поиск: /cancel_duel")
+        return
+    
+    await message.answer(
+        f"🔍 Ищем соперника с близким рейтингом...\n\n"
+        f"🎮 {game} • 💰 {entry_fee} ₽\n"
+        f"Чем дольше ожидание, тем шире диапазон рейтинга. Отменить: /cancel_duel"
+    )
+
+
+@router.message(Command("cancel_duel"))
+async def cancel_duel(message: Message, session: AsyncSession):
+    """Отменить поиск соперника"""
+    user_service = UserService(session)
+    user = await user_service.get_user_by_telegram_id(message.from_user.id)
+    
+    if user and await matchmaker.dequeue(user.id):
+        await message.answer("✅ Поиск соперника отменен")
+    else:
+        await message.answer("Вы не в очереди на дуэль")
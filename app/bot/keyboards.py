@@ -1,6 +1,7 @@
 """
 Клавиатуры для бота
 """
+from typing import Optional
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
 
@@ -109,6 +110,27 @@ def get_confirmation_keyboard(action: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+def get_pagination_keyboard(
+    prefix: str,
+    next_cursor: Optional[str] = None,
+    prev_cursor: Optional[str] = None,
+    back_callback: Optional[str] = None
+) -> InlineKeyboardMarkup:
+    """Кнопки листания страниц с курсором в callback_data (<prefix>:<курсор>)"""
+    builder = InlineKeyboardBuilder()
+    
+    if prev_cursor:
+        builder.add(InlineKeyboardButton(text="⬅️ Новее", callback_data=f"{prefix}:{prev_cursor}"))
+    if next_cursor:
+        builder.add(InlineKeyboardButton(text="Раньше ➡️", callback_data=f"{prefix}:{next_cursor}"))
+    
+    if back_callback:
+        builder.add(InlineKeyboardButton(text="🔙 Назад", callback_data=back_callback))
+    
+    builder.adjust(2, 1)
+    return builder.as_markup()
+
+
 def get_profile_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура профиля"""
     builder = InlineKeyboardBuilder()
@@ -4,17 +4,73 @@ Middleware для бота
 import logging
 from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, User
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject, User
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.bot.throttling import create_rate_limiter
+from app.config import settings
 from app.database.connection import db
+from app.database.session import LazySession, session_metrics
 from app.services.user_service import UserService
 
 logger = logging.getLogger(__name__)
 
 
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Ограничение частоты запросов пользователя к обработчику
+    
+    Корзина жетонов на пару (пользователь, обработчик); обработчик может
+    задать свой лимит флагом rate_limit=(жетонов в секунду, запас).
+    Повторные нажатия одной кнопки склеиваются: первое обрабатывается сразу,
+    повторы в течение CALLBACK_COALESCE_WINDOW отбрасываются.
+    Регистрируется первым, поэтому отброшенный запрос не открывает сессию БД.
+    """
+    
+    def __init__(self, limiter):
+        self.limiter = limiter
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        handler_object = data.get("handler")
+        if user is None or handler_object is None:
+            return await handler(event, data)
+        
+        rate, burst = get_flag(
+            data, "rate_limit", default=(settings.THROTTLE_RATE, settings.THROTTLE_BURST)
+        )
+        callback = handler_object.callback
+        bucket = f"{user.id}:{callback.__module__}.{callback.__name__}"
+        
+        # Повторы склеиваются до проверки лимита: отброшенное нажатие
+        # не расходует жетон
+        if isinstance(event, CallbackQuery) and settings.CALLBACK_COALESCE_WINDOW > 0:
+            press = f"{user.id}:{event.data}"
+            if not await self.limiter.is_first_press(press, settings.CALLBACK_COALESCE_WINDOW):
+                await event.answer()
+                return None
+        
+        if not await self.limiter.consume(bucket, rate, burst):
+            if isinstance(event, CallbackQuery):
+                await event.answer("⏳ Слишком часто, подождите немного")
+            return None
+        
+        return await handler(event, data)
+
+
 class DatabaseMiddleware(BaseMiddleware):
-    """Middleware для работы с базой данных"""
+    """
+    Middleware для работы с базой данных
+    
+    Обработчик получает ленивую сессию: соединение из пула берется только
+    при первом запросе, обработчики интерфейса пул не занимают.
+    """
     
     async def __call__(
         self,
@@ -22,9 +78,13 @@ class DatabaseMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        async with db.async_session() as session:
-            data["session"] = session
+        session = LazySession(db.async_session)
+        data["session"] = session
+        try:
             return await handler(event, data)
+        finally:
+            await session.close()
+            session_metrics.record(session)
 
 
 class UserMiddleware(BaseMiddleware):
@@ -38,7 +98,15 @@ class UserMiddleware(BaseMiddleware):
     ) -> Any:
         session: AsyncSession = data.get("session")
         
-        if session and hasattr(event, "from_user") and event.from_user:
+        # Пользователь загружается только для обработчиков, которые его принимают
+        handler_object = data.get("handler")
+        wants_user = handler_object is not None and (
+            "user" in handler_object.params or handler_object.varkw
+        )
+        
+        if wants_user and session and hasattr(event, "from_user") and event.from_user:
+            # Пользователь запоминается в сессии, и UserService в обработчиках
+            # получает его без повторного запроса
             user_service = UserService(session)
             user = await user_service.get_user_by_telegram_id(event.from_user.id)
             data["user"] = user
@@ -66,6 +134,11 @@ class LoggingMiddleware(BaseMiddleware):
 
 def register_middlewares(dp):
     """Регистрация всех middleware"""
+    # Ограничитель идет первым: лишние запросы отсекаются до обращения к БД
+    throttling = ThrottlingMiddleware(create_rate_limiter())
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+    
     dp.message.middleware(DatabaseMiddleware())
     dp.callback_query.middleware(DatabaseMiddleware())
     
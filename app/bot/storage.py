@@ -0,0 +1,188 @@
+"""
+Хранилище состояний FSM в Redis
+"""
+import asyncio
+import zlib
+from contextvars import ContextVar
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+import msgpack
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import DEFAULT_DESTINY, BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from redis.asyncio import Redis
+
+from app.bot.states import (
+    GameStates, PaymentStates, TournamentCreation, UserRegistration, WithdrawalStates
+)
+from app.config import settings
+from app.database.redis_client import redis_client
+
+KEY_PREFIX = "fsm:v1"
+
+# Поля хеша пользователя: состояние и данные
+STATE_FIELD = b"s"
+DATA_FIELD = b"d"
+
+# Время жизни по группе состояний: брошенный диалог не хранится вечно
+STATE_TTLS = {
+    UserRegistration: 900,
+    TournamentCreation: 3600,
+    PaymentStates: 900,
+    WithdrawalStates: 900,
+    GameStates: 7200,
+}
+
+
+def _build_codes() -> Tuple[Dict[str, Tuple[int, int]], Dict[int, str]]:
+    """
+    Коды известных состояний: CRC32 имени вместо строки вида "Группа:состояние"
+
+    Код зависит только от имени, поэтому не меняется при добавлении
+    новых состояний; удаленное состояние при чтении сбрасывается.
+    """
+    states: Dict[str, Tuple[int, int]] = {}
+    codes: Dict[int, str] = {}
+
+    for group, ttl in STATE_TTLS.items():
+        for state in group.__all_states__:
+            code = zlib.crc32(state.state.encode())
+            if code in codes:
+                raise RuntimeError(f"FSM state code collision: {state.state} and {codes[code]}")
+            states[state.state] = (code, ttl)
+            codes[code] = state.state
+
+    return states, codes
+
+
+_STATES, _CODES = _build_codes()
+
+# Состояние и данные, прочитанные при обработке текущего апдейта. aiogram
+# читает состояние в middleware, а обработчик затем читает данные: оба
+# значения приходят одним HGETALL, второй раз в Redis не ходим
+_snapshot: ContextVar[Optional[tuple]] = ContextVar("fsm_snapshot", default=None)
+
+
+def _pack_default(value: Any) -> Any:
+    """Типы, которых нет в msgpack"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot store {type(value).__name__} in FSM data")
+
+
+def _encode_state(state: str) -> bytes:
+    known = _STATES.get(state)
+    return msgpack.packb(known[0] if known else state)
+
+
+def _decode_state(raw: Optional[bytes]) -> Optional[str]:
+    if raw is None:
+        return None
+    value = msgpack.unpackb(raw)
+    return _CODES.get(value) if isinstance(value, int) else value
+
+
+class RedisFSMStorage(BaseStorage):
+    """
+    Состояния и данные FSM в хеше Redis на пользователя
+
+    Состояние хранится кодом, данные - в msgpack. Чтение состояния
+    забирает и данные, поэтому обычный апдейт стоит одного чтения;
+    каждая запись - один конвейер с продлением срока жизни по группе
+    состояния. Состояния общие для всех процессов бота.
+    """
+
+    def __init__(self, redis: Redis, default_ttl: int):
+        self.redis = redis
+        self.default_ttl = default_ttl
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        parts = [KEY_PREFIX, str(key.bot_id), str(key.chat_id), str(key.user_id)]
+        if key.thread_id:
+            parts.append(str(key.thread_id))
+        if key.destiny != DEFAULT_DESTINY:
+            parts.append(key.destiny)
+        return ":".join(parts)
+
+    def _ttl(self, state: Optional[str]) -> int:
+        known = _STATES.get(state)
+        return known[1] if known else self.default_ttl
+
+    def _cached(self, key: StorageKey) -> Optional[Tuple[Optional[str], Dict[str, Any]]]:
+        snapshot = _snapshot.get()
+        # Задача апдейта наследует контекст создателя: сверяем и задачу
+        if snapshot and snapshot[0] is asyncio.current_task() and snapshot[1] == key:
+            return snapshot[2], snapshot[3]
+        return None
+
+    def _remember(self, key: StorageKey, state: Optional[str], data: Dict[str, Any]):
+        _snapshot.set((asyncio.current_task(), key, state, dict(data)))
+
+    async def _load(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        raw = await self.redis.hgetall(self._key(key))
+
+        state = _decode_state(raw.get(STATE_FIELD))
+        data = msgpack.unpackb(raw[DATA_FIELD]) if DATA_FIELD in raw else {}
+
+        self._remember(key, state, data)
+        return state, data
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        name = self._key(key)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if state is None:
+                pipe.hdel(name, STATE_FIELD)
+            else:
+                pipe.hset(name, STATE_FIELD, _encode_state(state))
+                pipe.expire(name, self._ttl(state))
+            await pipe.execute()
+
+        cached = self._cached(key)
+        if cached is not None:
+            self._remember(key, state, cached[1])
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        name = self._key(key)
+        cached = self._cached(key)
+        state = cached[0] if cached is not None else None
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if data:
+                pipe.hset(name, DATA_FIELD, msgpack.packb(data, default=_pack_default))
+                pipe.expire(name, self._ttl(state))
+            else:
+                pipe.hdel(name, DATA_FIELD)
+            await pipe.execute()
+
+        if cached is not None:
+            self._remember(key, state, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        cached = self._cached(key)
+        if cached is not None:
+            return dict(cached[1])
+
+        _, data = await self._load(key)
+        return data
+
+    async def close(self) -> None:
+        # Общий клиент Redis закрывается при остановке бота
+        pass
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Создать хранилище FSM по настройке FSM_STORAGE"""
+    if settings.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    return RedisFSMStorage(redis_client, default_ttl=settings.FSM_DEFAULT_TTL)
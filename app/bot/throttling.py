@@ -0,0 +1,125 @@
+"""
+Ограничение частоты запросов пользователей
+"""
+import logging
+import time
+from typing import Dict, Tuple
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "throttle:v1"
+
+# Корзина: остаток жетонов и время последнего пополнения.
+# Пополнение считается при обращении, поэтому фоновых таймеров нет
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(burst / rate * 1000))
+return allowed
+"""
+
+
+class MemoryRateLimiter:
+    """Корзины жетонов в памяти процесса (один процесс бота или тесты)"""
+
+    # Сколько корзин хранить, прежде чем выбросить заполненные доверху
+    MAX_BUCKETS = 100_000
+
+    def __init__(self):
+        # Корзина: (жетоны, время пополнения, жетонов в секунду, запас)
+        self._buckets: Dict[str, Tuple[float, float, float, int]] = {}
+        self._presses: Dict[str, float] = {}
+
+    async def consume(self, key: str, rate: float, burst: int) -> bool:
+        """Взять жетон; False, если корзина пуста"""
+        now = time.monotonic()
+        tokens, ts, _, _ = self._buckets.get(key, (burst, now, rate, burst))
+        tokens = min(burst, tokens + (now - ts) * rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now, rate, burst)
+
+        if len(self._buckets) > self.MAX_BUCKETS:
+            self._prune(now)
+        return allowed
+
+    async def is_first_press(self, key: str, window: float) -> bool:
+        """Первое ли это нажатие за window секунд; повторы внутри окна - False"""
+        now = time.monotonic()
+        expires = self._presses.get(key)
+        if expires is not None and expires > now:
+            return False
+
+        self._presses[key] = now + window
+        if len(self._presses) > self.MAX_BUCKETS:
+            self._presses = {k: t for k, t in self._presses.items() if t > now}
+        return True
+
+    def _prune(self, now: float):
+        # Каждая корзина пополняется по своему лимиту
+        self._buckets = {
+            key: bucket
+            for key, bucket in self._buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[2] < bucket[3]
+        }
+
+
+class RedisRateLimiter:
+    """
+    Корзины жетонов в Redis, общие для всех процессов бота
+
+    Проверка корзины - один атомарный скрипт. Если Redis недоступен,
+    запрос пропускается: ограничитель не должен останавливать бота.
+    """
+
+    def __init__(self):
+        self._script = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def consume(self, key: str, rate: float, burst: int) -> bool:
+        try:
+            allowed = await self._script(
+                keys=[f"{KEY_PREFIX}:bucket:{key}"],
+                args=[rate, burst, time.time()]
+            )
+        except RedisError as e:
+            logger.warning(f"Rate limiter check failed: {e}")
+            return True
+
+        return bool(allowed)
+
+    async def is_first_press(self, key: str, window: float) -> bool:
+        # Окно открывает первое нажатие: SET NX PX
+        try:
+            return bool(await redis_client.set(
+                f"{KEY_PREFIX}:press:{key}", 1, nx=True, px=max(int(window * 1000), 1)
+            ))
+        except RedisError as e:
+            logger.warning(f"Callback coalescing failed: {e}")
+            return True
+
+
+def create_rate_limiter():
+    """Создать ограничитель по настройке THROTTLE_BACKEND"""
+    if settings.THROTTLE_BACKEND == "memory":
+        return MemoryRateLimiter()
+    return RedisRateLimiter()
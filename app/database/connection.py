@@ -2,6 +2,9 @@
 Подключение к базе данных
 """
 import asyncio
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from app.config import settings
@@ -22,8 +25,17 @@ class Database:
             expire_on_commit=False
         )
     
+    async def get_schema_version(self) -> Optional[str]:
+        """Ревизия схемы из alembic_version (None, если миграции не применялись)"""
+        async with self.engine.connect() as conn:
+            try:
+                result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            except ProgrammingError:
+                return None
+            return result.scalar()
+    
     async def create_tables(self):
-        """Создание всех таблиц"""
+        """Создание всех таблиц (для тестовых баз; рабочая схема ведется миграциями)"""
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
     
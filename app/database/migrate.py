@@ -0,0 +1,81 @@
+"""
+Миграции схемы базы данных
+
+Запуск:
+    python -m app.database.migrate              # применить все миграции
+    python -m app.database.migrate stamp 0001   # отметить базу, созданную до миграций
+    python -m app.database.migrate current      # показать ревизию базы
+    python -m app.database.migrate check        # сверить схему базы с моделями
+"""
+import argparse
+from functools import lru_cache
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+
+from app.database.connection import db
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def get_config() -> Config:
+    """Конфигурация Alembic проекта"""
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    return config
+
+
+@lru_cache(maxsize=1)
+def get_head_revision() -> str:
+    """Последняя ревизия в каталоге миграций (без обращения к БД)"""
+    return ScriptDirectory.from_config(get_config()).get_current_head()
+
+
+async def check_schema_version():
+    """
+    Убедиться, что схема базы соответствует коду
+
+    Выполняет один запрос к alembic_version вместо отражения метаданных,
+    поэтому почти не влияет на время старта нового процесса.
+    """
+    current = await db.get_schema_version()
+    head = get_head_revision()
+
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}. "
+            f"Run: python -m app.database.migrate"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Миграции базы данных")
+    parser.add_argument(
+        "action", nargs="?", default="upgrade",
+        choices=["upgrade", "downgrade", "stamp", "current", "check", "history"]
+    )
+    parser.add_argument("revision", nargs="?", help="ревизия (по умолчанию head)")
+    args = parser.parse_args()
+
+    config = get_config()
+
+    if args.action == "upgrade":
+        command.upgrade(config, args.revision or "head")
+    elif args.action == "downgrade":
+        if not args.revision:
+            parser.error("downgrade requires a revision")
+        command.downgrade(config, args.revision)
+    elif args.action == "stamp":
+        command.stamp(config, args.revision or "head")
+    elif args.action == "current":
+        command.current(config, verbose=True)
+    elif args.action == "check":
+        command.check(config)
+    else:
+        command.history(config)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,7 @@ from decimal import Decimal
 from typing import Optional
 from sqlalchemy import (
     BigInteger, Boolean, Column, DateTime, ForeignKey, 
-    Integer, Numeric, String, Text, Enum as SQLEnum
+    Index, Integer, Numeric, String, Text, Enum as SQLEnum, text
 )
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -21,6 +21,7 @@ class TransactionType(str, Enum):
     TOURNAMENT_FEE = "tournament_fee"
     PRIZE = "prize"
     REFERRAL_BONUS = "referral_bonus"
+    REFUND = "refund"
 
 
 class TransactionStatus(str, Enum):
@@ -30,6 +31,19 @@ class TransactionStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class LedgerAccount(str, Enum):
+    USER = "user"                # кошелек пользователя
+    EXTERNAL = "external"        # деньги вне платформы (пополнения и выводы)
+    TOURNAMENTS = "tournaments"  # взносы и призы турниров
+    BONUSES = "bonuses"          # бонусы платформы
+
+
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"  # попытки исчерпаны
+
+
 class TournamentType(str, Enum):
     DUEL = "duel"
     GROUP = "group"
@@ -58,6 +72,10 @@ class GameType(str, Enum):
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Рейтинг: WHERE is_banned = false ORDER BY rating DESC
+        Index("ix_users_is_banned_rating", "is_banned", "rating"),
+    )
     
     id = Column(BigInteger, primary_key=True)
     telegram_id = Column(BigInteger, unique=True, nullable=False, index=True)
@@ -102,6 +120,15 @@ class User(Base):
 
 class Tournament(Base):
     __tablename__ = "tournaments"
+    __table_args__ = (
+        Index("ix_tournaments_status_game_type", "status", "game_type"),
+        # Списки открытых турниров; enum хранится в БД по именам членов
+        Index(
+            "ix_tournaments_active_created_at_id",
+            "created_at", "id",
+            postgresql_where=text("status IN ('REGISTRATION', 'IN_PROGRESS')")
+        ),
+    )
     
     id = Column(BigInteger, primary_key=True)
     creator_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
@@ -120,6 +147,8 @@ class Tournament(Base):
     # Настройки
     max_participants = Column(Integer, nullable=False)
     min_participants = Column(Integer, default=2, nullable=False)
+    participant_count = Column(Integer, default=0, nullable=False)  # поддерживается при регистрации
+    results_count = Column(Integer, default=0, nullable=False)  # участники, приславшие результат
     prize_distribution = Column(Text, nullable=True)  # JSON строка
     
     # Статус
@@ -138,6 +167,11 @@ class Tournament(Base):
 
 class Participant(Base):
     __tablename__ = "participants"
+    __table_args__ = (
+        # Один пользователь участвует в турнире один раз
+        Index("uq_participants_tournament_id_user_id", "tournament_id", "user_id", unique=True),
+        Index("ix_participants_user_id", "user_id"),
+    )
     
     id = Column(BigInteger, primary_key=True)
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
@@ -160,6 +194,28 @@ class Participant(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_id_type_status", "user_id", "transaction_type", "status"),
+        # История операций с keyset-пагинацией по (created_at, id)
+        Index("ix_transactions_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Очередь заявок на вывод
+        Index(
+            "ix_transactions_pending_withdrawals",
+            "created_at",
+            postgresql_where=text("transaction_type = 'WITHDRAWAL' AND status = 'PENDING'")
+        ),
+        # Повторные уведомления платежной системы и повторы запросов
+        # находят уже созданную транзакцию
+        Index("uq_transactions_external_id", "external_id", unique=True),
+        Index("uq_transactions_idempotency_key", "idempotency_key", unique=True),
+        # Взнос возвращается участнику не более одного раза
+        Index(
+            "uq_transactions_refund_tournament_id_user_id",
+            "tournament_id", "user_id",
+            unique=True,
+            postgresql_where=text("transaction_type = 'REFUND'")
+        ),
+    )
     
     id = Column(BigInteger, primary_key=True)
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
@@ -172,6 +228,7 @@ class Transaction(Base):
     # Дополнительная информация
     description = Column(Text, nullable=True)
     external_id = Column(String(128), nullable=True)  # ID в платежной системе
+    idempotency_key = Column(String(128), nullable=True)  # Ключ запроса, создавшего транзакцию
     payment_method = Column(String(32), nullable=True)  # telegram_stars, yookassa, crypto
     
     # Связанные объекты
@@ -186,6 +243,66 @@ class Transaction(Base):
     tournament = relationship("Tournament")
 
 
+class LedgerEntry(Base):
+    """Неизменяемая проводка: каждая операция записывает пару строк с нулевой суммой"""
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        Index("ix_ledger_entries_user_id_id", "user_id", "id"),
+    )
+    
+    id = Column(BigInteger, primary_key=True)
+    account = Column(SQLEnum(LedgerAccount), nullable=False)
+    user_id = Column(BigInteger, ForeignKey("users.id"), nullable=True)  # только для USER
+    
+    # Положительная сумма увеличивает счет, отрицательная - уменьшает
+    amount = Column(Numeric(12, 2), nullable=False)
+    entry_type = Column(SQLEnum(TransactionType), nullable=False)
+    description = Column(Text, nullable=True)
+    
+    transaction_id = Column(BigInteger, ForeignKey("transactions.id"), nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Связи
+    transaction = relationship("Transaction")
+
+
+class LedgerSnapshot(Base):
+    """Баланс пользователя по проводкам до last_entry_id включительно"""
+    __tablename__ = "ledger_snapshots"
+    
+    user_id = Column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    balance = Column(Numeric(12, 2), nullable=False)
+    last_entry_id = Column(BigInteger, default=0, nullable=False)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class OutboxMessage(Base):
+    """Внешнее действие, записанное в одной транзакции с изменением данных"""
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # Очередь диспетчера: неотправленные сообщения по времени готовности
+        Index(
+            "ix_outbox_pending_available_at",
+            "available_at",
+            postgresql_where=text("status = 'PENDING'")
+        ),
+    )
+    
+    id = Column(BigInteger, primary_key=True)
+    kind = Column(String(32), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    
+    status = Column(SQLEnum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = Column(DateTime, nullable=True)
+
+
 class GameSession(Base):
     __tablename__ = "game_sessions"
     
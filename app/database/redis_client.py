@@ -0,0 +1,10 @@
+"""
+Подключение к Redis
+"""
+from redis.asyncio import Redis
+
+from app.config import settings
+
+
+# Глобальный клиент Redis
+redis_client = Redis.from_url(settings.REDIS_URL)
@@ -0,0 +1,83 @@
+"""
+Ленивая сессия базы данных для обработчиков бота
+"""
+import asyncio
+import logging
+from typing import Any, Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+
+class SessionMetrics:
+    """Сколько апдейтов создали сессию и сколько взяли соединение из пула"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.updates = 0
+        self.sessions = 0
+        self.connections = 0
+
+    def record(self, session: "LazySession"):
+        self.updates += 1
+        if session.started:
+            self.sessions += 1
+        if session.connected:
+            self.connections += 1
+
+    def summary(self) -> str:
+        share = self.connections / self.updates * 100 if self.updates else 0.0
+        return (
+            f"{self.updates} updates, {self.sessions} sessions, "
+            f"{self.connections} used a connection ({share:.1f}%)"
+        )
+
+
+class LazySession:
+    """
+    Прокси сессии, создающий ее при первом обращении
+
+    Обработчик получает прокси вместо AsyncSession: обработчики интерфейса,
+    которые не ходят в БД, не создают сессию, а соединение из пула берется
+    только при первом запросе.
+    """
+
+    def __init__(self, factory: async_sessionmaker):
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+        self.connected = False
+
+    @property
+    def started(self) -> bool:
+        return self._session is not None
+
+    def _get(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+            event.listen(self._session.sync_session, "after_begin", self._on_begin)
+        return self._session
+
+    def _on_begin(self, session, transaction, connection):
+        self.connected = True
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+async def run_session_metrics_worker(interval: int):
+    """Периодически писать в лог долю апдейтов, которым понадобилась БД"""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"DB sessions: {session_metrics.summary()}")
+        session_metrics.reset()
+
+
+# Глобальный экземпляр счетчиков сессий
+session_metrics = SessionMetrics()
@@ -0,0 +1,308 @@
+"""
+Битборд-движок для игры 2048
+
+Доска упакована в одно 64-битное число: 16 клеток по 4 бита, в каждой
+хранится показатель степени плитки (0 - пусто, 1 - 2, 2 - 4, ..., 15 - 32768).
+Строка r занимает биты 16*r..16*r+15, столбец c внутри строки - биты 4*c..4*c+3.
+
+Ходы по строкам выполняются через предрасчитанные таблицы на все 65 536
+вариантов строки, поэтому ход - это четыре обращения к таблице.
+
+Новые плитки выставляются детерминированным генератором mulberry32, который
+один в один повторяется в WebApp, поэтому партию можно переиграть на сервере
+по seed и строке ходов.
+"""
+from typing import List, Tuple
+
+ROW_MASK = 0xFFFF
+COL_MASK = 0x000F000F000F000F
+CELL_LOW_BITS = 0x1111111111111111
+SEED_MASK = 0xFFFFFFFF
+MAX_EXPONENT = 15
+
+DIRECTIONS = ("up", "down", "left", "right")
+
+
+def _reverse_row(row: int) -> int:
+    """Развернуть 16-битную строку"""
+    return (
+        (row >> 12)
+        | ((row >> 4) & 0x00F0)
+        | ((row << 4) & 0x0F00)
+        | ((row << 12) & 0xF000)
+    )
+
+
+def _unpack_col(row: int) -> int:
+    """Разложить 16-битную строку в столбец 0 доски"""
+    return (row | (row << 12) | (row << 24) | (row << 36)) & COL_MASK
+
+
+def _build_tables() -> Tuple[List[int], List[int], List[int], List[int], List[int]]:
+    """Построить таблицы ходов и очков для всех вариантов строки"""
+    row_left = [0] * 65536
+    row_right = [0] * 65536
+    col_up = [0] * 65536
+    col_down = [0] * 65536
+    row_score = [0] * 65536
+
+    for row in range(65536):
+        line = [(row >> 0) & 0xF, (row >> 4) & 0xF, (row >> 8) & 0xF, (row >> 12) & 0xF]
+
+        # Сдвигаем влево и объединяем одинаковые плитки
+        non_zero = [cell for cell in line if cell]
+        merged = []
+        score = 0
+        i = 0
+        while i < len(non_zero):
+            current = non_zero[i]
+            if (
+                i + 1 < len(non_zero)
+                and non_zero[i + 1] == current
+                and current < MAX_EXPONENT
+            ):
+                merged.append(current + 1)
+                score += 1 << (current + 1)
+                i += 2
+            else:
+                merged.append(current)
+                i += 1
+        merged += [0] * (4 - len(merged))
+
+        result = merged[0] | (merged[1] << 4) | (merged[2] << 8) | (merged[3] << 12)
+        reversed_row = _reverse_row(row)
+        reversed_result = _reverse_row(result)
+
+        row_left[row] = result
+        row_right[reversed_row] = reversed_result
+        col_up[row] = _unpack_col(result)
+        col_down[reversed_row] = _unpack_col(reversed_result)
+        # Количество слияний не зависит от направления хода
+        row_score[row] = score
+
+    return row_left, row_right, col_up, col_down, row_score
+
+
+ROW_LEFT, ROW_RIGHT, COL_UP, COL_DOWN, ROW_SCORE = _build_tables()
+
+
+def transpose(board: int) -> int:
+    """Транспонировать доску"""
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def move_left(board: int) -> Tuple[int, int]:
+    """Ход влево: (новая доска, очки за ход)"""
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = (board >> 48) & ROW_MASK
+    return (
+        ROW_LEFT[r0] | (ROW_LEFT[r1] << 16) | (ROW_LEFT[r2] << 32) | (ROW_LEFT[r3] << 48),
+        ROW_SCORE[r0] + ROW_SCORE[r1] + ROW_SCORE[r2] + ROW_SCORE[r3]
+    )
+
+
+def move_right(board: int) -> Tuple[int, int]:
+    """Ход вправо: (новая доска, очки за ход)"""
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = (board >> 48) & ROW_MASK
+    return (
+        ROW_RIGHT[r0] | (ROW_RIGHT[r1] << 16) | (ROW_RIGHT[r2] << 32) | (ROW_RIGHT[r3] << 48),
+        ROW_SCORE[r0] + ROW_SCORE[r1] + ROW_SCORE[r2] + ROW_SCORE[r3]
+    )
+
+
+def move_up(board: int) -> Tuple[int, int]:
+    """Ход вверх: (новая доска, очки за ход)"""
+    t = transpose(board)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = (t >> 48) & ROW_MASK
+    return (
+        COL_UP[c0] | (COL_UP[c1] << 4) | (COL_UP[c2] << 8) | (COL_UP[c3] << 12),
+        ROW_SCORE[c0] + ROW_SCORE[c1] + ROW_SCORE[c2] + ROW_SCORE[c3]
+    )
+
+
+def move_down(board: int) -> Tuple[int, int]:
+    """Ход вниз: (новая доска, очки за ход)"""
+    t = transpose(board)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = (t >> 48) & ROW_MASK
+    return (
+        COL_DOWN[c0] | (COL_DOWN[c1] << 4) | (COL_DOWN[c2] << 8) | (COL_DOWN[c3] << 12),
+        ROW_SCORE[c0] + ROW_SCORE[c1] + ROW_SCORE[c2] + ROW_SCORE[c3]
+    )
+
+
+MOVES = {
+    "up": move_up,
+    "down": move_down,
+    "left": move_left,
+    "right": move_right,
+}
+
+# Коды ходов в строке, которую присылает WebApp
+MOVE_CODES = {
+    "U": move_up,
+    "D": move_down,
+    "L": move_left,
+    "R": move_right,
+}
+
+
+def next_random(state: int) -> Tuple[int, int]:
+    """Шаг генератора mulberry32: (новое состояние, 32-битное число)"""
+    state = (state + 0x6D2B79F5) & SEED_MASK
+    t = ((state ^ (state >> 15)) * (state | 1)) & SEED_MASK
+    t = ((t + (((t ^ (t >> 7)) * (t | 61)) & SEED_MASK)) & SEED_MASK) ^ t
+    return state, t ^ (t >> 14)
+
+
+def spawn_tile(board: int, state: int) -> Tuple[int, int]:
+    """Поставить новую плитку (2 с вероятностью 90%, иначе 4): (доска, состояние)"""
+    empty = board | (board >> 2)
+    empty = ~(empty | (empty >> 1)) & CELL_LOW_BITS
+    if not empty:
+        return board, state
+
+    state, value = next_random(state)
+    # Пропускаем k пустых клеток в порядке обхода по строкам
+    for _ in range(value % empty.bit_count()):
+        empty &= empty - 1
+    shift = (empty & -empty).bit_length() - 1
+
+    state, value = next_random(state)
+    exponent = 2 if value % 10 == 0 else 1
+    return board | (exponent << shift), state
+
+
+def new_game(seed: int) -> Tuple[int, int]:
+    """Начальная доска с двумя плитками: (доска, состояние генератора)"""
+    board, state = spawn_tile(0, seed & SEED_MASK)
+    return spawn_tile(board, state)
+
+
+def replay(seed: int, moves: str) -> Tuple[int, int, int, bool]:
+    """
+    Переиграть партию по seed и строке ходов
+
+    Возвращает (доска, очки, количество ходов, корректна ли запись).
+    Запись некорректна, если в ней есть неизвестный код или ход,
+    который не меняет доску: WebApp такие ходы не записывает.
+
+    Это горячий путь проверки результатов, поэтому ходы и генератор
+    развернуты прямо в цикле, без вызовов move_* и spawn_tile.
+    """
+    board, state = new_game(seed)
+    score = 0
+    count = 0
+
+    row_left, row_right, col_up, col_down, row_score = (
+        ROW_LEFT, ROW_RIGHT, COL_UP, COL_DOWN, ROW_SCORE
+    )
+
+    for code in moves:
+        if code == "L" or code == "R":
+            r0 = board & 0xFFFF
+            r1 = (board >> 16) & 0xFFFF
+            r2 = (board >> 32) & 0xFFFF
+            r3 = board >> 48
+            table = row_left if code == "L" else row_right
+            new_board = table[r0] | (table[r1] << 16) | (table[r2] << 32) | (table[r3] << 48)
+        elif code == "U" or code == "D":
+            a = board & 0xF0F00F0FF0F00F0F
+            a |= ((board & 0x0000F0F00000F0F0) << 12) | ((board & 0x0F0F00000F0F0000) >> 12)
+            t = (
+                (a & 0xFF00FF0000FF00FF)
+                | ((a & 0x00FF00FF00000000) >> 24)
+                | ((a & 0x00000000FF00FF00) << 24)
+            )
+            r0 = t & 0xFFFF
+            r1 = (t >> 16) & 0xFFFF
+            r2 = (t >> 32) & 0xFFFF
+            r3 = t >> 48
+            table = col_up if code == "U" else col_down
+            new_board = table[r0] | (table[r1] << 4) | (table[r2] << 8) | (table[r3] << 12)
+        else:
+            return board, score, count, False
+
+        if new_board == board:
+            return board, score, count, False
+
+        score += row_score[r0] + row_score[r1] + row_score[r2] + row_score[r3]
+        count += 1
+
+        # Новая плитка: после сдвига всегда есть хотя бы одна пустая клетка
+        empty = new_board | (new_board >> 2)
+        empty = ~(empty | (empty >> 1)) & CELL_LOW_BITS
+
+        state = (state + 0x6D2B79F5) & SEED_MASK
+        x = ((state ^ (state >> 15)) * (state | 1)) & SEED_MASK
+        x = ((x + (((x ^ (x >> 7)) * (x | 61)) & SEED_MASK)) & SEED_MASK) ^ x
+        for _ in range((x ^ (x >> 14)) % empty.bit_count()):
+            empty &= empty - 1
+        shift = (empty & -empty).bit_length() - 1
+
+        state = (state + 0x6D2B79F5) & SEED_MASK
+        x = ((state ^ (state >> 15)) * (state | 1)) & SEED_MASK
+        x = ((x + (((x ^ (x >> 7)) * (x | 61)) & SEED_MASK)) & SEED_MASK) ^ x
+        board = new_board | ((2 if (x ^ (x >> 14)) % 10 == 0 else 1) << shift)
+
+    return board, score, count, True
+
+
+def max_exponent(board: int) -> int:
+    """Максимальный показатель степени на доске"""
+    result = 0
+    while board:
+        cell = board & 0xF
+        if cell > result:
+            result = cell
+        board >>= 4
+    return result
+
+
+def can_move(board: int) -> bool:
+    """Проверить, есть ли хотя бы один допустимый ход"""
+    return (
+        move_left(board)[0] != board
+        or move_right(board)[0] != board
+        or move_up(board)[0] != board
+        or move_down(board)[0] != board
+    )
+
+
+def pack(board: List[List[int]]) -> int:
+    """Упаковать доску из значений плиток в битборд"""
+    packed = 0
+    for r, row in enumerate(board):
+        for c, value in enumerate(row):
+            if value:
+                packed |= (value.bit_length() - 1) << (16 * r + 4 * c)
+    return packed
+
+
+def unpack(board: int) -> List[List[int]]:
+    """Распаковать битборд в доску из значений плиток"""
+    result = []
+    for r in range(4):
+        row = []
+        for c in range(4):
+            exponent = (board >> (16 * r + 4 * c)) & 0xF
+            row.append(1 << exponent if exponent else 0)
+        result.append(row)
+    return result
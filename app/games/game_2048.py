@@ -1,11 +1,13 @@
 """
 Игра 2048
 """
-import random
+import secrets
 import time
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List
 from dataclasses import dataclass
 
+from app.games import bitboard_2048 as bitboard
+
 
 @dataclass
 class Game2048Result:
@@ -21,214 +23,107 @@ class Game2048:
         self.board_size = 4
         self.target_tile = 2048
         self.max_time = 300  # 5 минут
+        self.max_moves = 10000  # не более ~33 ходов в секунду
         
     def start_game(self) -> Dict[str, Any]:
         """Начать игру"""
-        board = self._create_empty_board()
-        board = self._add_random_tile(board)
-        board = self._add_random_tile(board)
+        # Seed выдается сервером: по нему и строке ходов партия переигрывается
+        seed = secrets.randbits(32)
+        board, rng_state = bitboard.new_game(seed)
         
         return {
             "game_type": "2048",
-            "board": board,
+            "seed": seed,
+            "rng_state": rng_state,
+            "board": bitboard.unpack(board),
             "score": 0,
             "moves": 0,
-            "max_tile": 2,
+            "max_tile": 1 << bitboard.max_exponent(board),
             "start_time": time.time(),
             "instructions": "Используйте стрелки для перемещения плиток. Цель: получить плитку 2048!"
         }
     
     def process_move(self, game_state: Dict[str, Any], direction: str) -> Dict[str, Any]:
         """Обработать ход"""
-        board = game_state["board"]
-        score = game_state["score"]
-        moves = game_state["moves"]
-        max_tile = game_state["max_tile"]
-        
-        # Сохраняем предыдущее состояние для проверки изменений
-        old_board = [row[:] for row in board]
-        
-        # Выполняем ход
-        if direction == "up":
-            board, move_score = self._move_up(board)
-        elif direction == "down":
-            board, move_score = self._move_down(board)
-        elif direction == "left":
-            board, move_score = self._move_left(board)
-        elif direction == "right":
-            board, move_score = self._move_right(board)
-        else:
+        move = bitboard.MOVES.get(direction)
+        if move is None:
             return game_state
         
+        board = bitboard.pack(game_state["board"])
+        new_board, move_score = move(board)
+        
         # Проверяем, изменилась ли доска
-        if board == old_board:
+        if new_board == board:
             return game_state  # Ход не изменил доску
         
-        # Обновляем счет и количество ходов
-        score += move_score
-        moves += 1
-        
         # Добавляем новую плитку
-        board = self._add_random_tile(board)
-        
-        # Обновляем максимальную плитку
-        max_tile = max(max(row) for row in board)
+        new_board, rng_state = bitboard.spawn_tile(new_board, game_state["rng_state"])
         
-        # Проверяем условия окончания игры
-        game_over = self._is_game_over(board)
-        won = max_tile >= self.target_tile
+        max_tile = 1 << bitboard.max_exponent(new_board)
         
         return {
-            "board": board,
-            "score": score,
-            "moves": moves,
+            "seed": game_state["seed"],
+            "rng_state": rng_state,
+            "board": bitboard.unpack(new_board),
+            "score": game_state["score"] + move_score,
+            "moves": game_state["moves"] + 1,
             "max_tile": max_tile,
-            "game_over": game_over,
-            "won": won,
+            "game_over": not bitboard.can_move(new_board),
+            "won": max_tile >= self.target_tile,
             "start_time": game_state["start_time"]
         }
     
-    def process_results(self, game_state: Dict[str, Any]) -> Game2048Result:
+    def process_results(self, game_state: Dict[str, Any], moves: str) -> Game2048Result:
         """Обработать результаты игры"""
-        score = game_state["score"]
-        max_tile = game_state["max_tile"]
-        moves = game_state["moves"]
         start_time = game_state["start_time"]
         end_time = time.time()
         
-        # Проверяем валидность времени игры
-        duration = end_time - start_time
-        if duration > self.max_time:
-            return Game2048Result(
-                final_score=0,
-                max_tile=0,
-                moves_count=0,
-                time_seconds=duration,
-                is_valid=False
-            )
+        # Счет клиента не учитываем: переигрываем партию по seed и ходам
+        return self.validate_replay(game_state["seed"], moves, end_time - start_time)
+    
+    def validate_replay(self, seed: int, moves: str, time_seconds: float = 0.0) -> Game2048Result:
+        """
+        Переиграть партию и получить достоверный результат
+        
+        time_seconds - длительность партии по серверным меткам; партия
+        дольше max_time не засчитывается.
+        """
+        if time_seconds > self.max_time or len(moves) > self.max_moves:
+            return self._invalid_result(time_seconds)
+        
+        board, score, moves_count, is_valid = bitboard.replay(seed, moves)
+        if not is_valid:
+            return self._invalid_result(time_seconds)
+        
+        max_tile = 1 << bitboard.max_exponent(board)
         
         # Рассчитываем очки
-        final_score = score + (max_tile * 10) + (moves * 5)
+        final_score = score + (max_tile * 10) + (moves_count * 5)
         
         return Game2048Result(
             final_score=final_score,
             max_tile=max_tile,
-            moves_count=moves,
-            time_seconds=duration,
+            moves_count=moves_count,
+            time_seconds=time_seconds,
             is_valid=True
         )
     
-    def _create_empty_board(self) -> List[List[int]]:
-        """Создать пустую доску"""
-        return [[0 for _ in range(self.board_size)] for _ in range(self.board_size)]
-    
-    def _add_random_tile(self, board: List[List[int]]) -> List[List[int]]:
-        """Добавить случайную плитку (2 или 4)"""
-        empty_cells = []
-        for i in range(self.board_size):
-            for j in range(self.board_size):
-                if board[i][j] == 0:
-                    empty_cells.append((i, j))
-        
-        if empty_cells:
-            row, col = random.choice(empty_cells)
-            board[row][col] = random.choice([2, 4])
-        
-        return board
-    
-    def _move_left(self, board: List[List[int]]) -> Tuple[List[List[int]], int]:
-        """Движение влево"""
-        new_board = []
-        score = 0
-        
-        for row in board:
-            # Убираем нули
-            non_zero = [cell for cell in row if cell != 0]
-            
-            # Объединяем одинаковые плитки
-            merged = []
-            i = 0
-            while i < len(non_zero):
-                if i < len(non_zero) - 1 and non_zero[i] == non_zero[i + 1]:
-                    merged.append(non_zero[i] * 2)
-                    score += non_zero[i] * 2
-                    i += 2
-                else:
-                    merged.append(non_zero[i])
-                    i += 1
-            
-            # Дополняем нулями
-            while len(merged) < self.board_size:
-                merged.append(0)
-            
-            new_board.append(merged)
-        
-        return new_board, score
-    
-    def _move_right(self, board: List[List[int]]) -> Tuple[List[List[int]], int]:
-        """Движение вправо"""
-        new_board = []
-        score = 0
-        
-        for row in board:
-            # Убираем нули
-            non_zero = [cell for cell in row if cell != 0]
-            
-            # Объединяем одинаковые плитки
-            merged = []
-            i = len(non_zero) - 1
-            while i >= 0:
-                if i > 0 and non_zero[i] == non_zero[i - 1]:
-                    merged.insert(0, non_zero[i] * 2)
-                    score += non_zero[i] * 2
-                    i -= 2
-                else:
-                    merged.insert(0, non_zero[i])
-                    i -= 1
-            
-            # Дополняем нулями
-            while len(merged) < self.board_size:
-                merged.insert(0, 0)
-            
-            new_board.append(merged)
-        
-        return new_board, score
-    
-    def _move_up(self, board: List[List[int]]) -> Tuple[List[List[int]], int]:
-        """Движение вверх"""
-        # Транспонируем, двигаем влево, транспонируем обратно
-        transposed = list(zip(*board))
-        moved, score = self._move_left([list(row) for row in transposed])
-        return list(zip(*moved)), score
-    
-    def _move_down(self, board: List[List[int]]) -> Tuple[List[List[int]], int]:
-        """Движение вниз"""
-        # Транспонируем, двигаем вправо, транспонируем обратно
-        transposed = list(zip(*board))
-        moved, score = self._move_right([list(row) for row in transposed])
-        return list(zip(*moved)), score
+    def _invalid_result(self, time_seconds: float) -> Game2048Result:
+        """Результат непрошедшей проверки игры"""
+        return Game2048Result(
+            final_score=0,
+            max_tile=0,
+            moves_count=0,
+            time_seconds=time_seconds,
+            is_valid=False
+        )
     
     def _is_game_over(self, board: List[List[int]]) -> bool:
         """Проверить, окончена ли игра"""
-        # Проверяем наличие пустых клеток
-        for row in board:
-            if 0 in row:
-                return False
-        
-        # Проверяем возможность объединения
-        for i in range(self.board_size):
-            for j in range(self.board_size):
-                current = board[i][j]
-                
-                # Проверяем соседние клетки
-                if (i < self.board_size - 1 and board[i + 1][j] == current) or \
-                   (j < self.board_size - 1 and board[i][j + 1] == current):
-                    return False
-        
-        return True
+        return not bitboard.can_move(bitboard.pack(board))
     
-    def generate_webview_html(self) -> str:
-        """Генерировать HTML для WebView"""
+    def generate_webview_html(self, seed: int) -> str:
+        """Генерировать HTML для WebView с seed, выданным start_game"""
         return """
 <!DOCTYPE html>
 <html>
@@ -441,6 +336,11 @@ class Game2048:
         let won = false;
         let startTime = Date.now();
         
+        // Seed выдает сервер; по нему и строке ходов партия переигрывается
+        const seed = __SEED__ >>> 0;
+        let rngState = seed;
+        let moveLog = '';
+        
         const grid = document.getElementById('grid');
         const scoreElement = document.getElementById('score');
         const movesElement = document.getElementById('moves');
@@ -462,12 +362,22 @@ class Game2048:
             gameOver = false;
             won = false;
             startTime = Date.now();
+            rngState = seed;
+            moveLog = '';
             
             addRandomTile();
             addRandomTile();
             updateDisplay();
         }
         
+        // Генератор mulberry32, совпадает с bitboard_2048.next_random
+        function nextRandom() {
+            rngState = (rngState + 0x6D2B79F5) | 0;
+            let t = Math.imul(rngState ^ (rngState >>> 15), rngState | 1);
+            t = (t + Math.imul(t ^ (t >>> 7), t | 61)) ^ t;
+            return (t ^ (t >>> 14)) >>> 0;
+        }
+        
         function addRandomTile() {
             const emptyCells = [];
             for (let i = 0; i < 4; i++) {
@@ -479,8 +389,8 @@ class Game2048:
             }
             
             if (emptyCells.length > 0) {
-                const randomCell = emptyCells[Math.floor(Math.random() * emptyCells.length)];
-                board[randomCell.row][randomCell.col] = Math.random() < 0.9 ? 2 : 4;
+                const randomCell = emptyCells[nextRandom() % emptyCells.length];
+                board[randomCell.row][randomCell.col] = nextRandom() % 10 === 0 ? 4 : 2;
             }
         }
         
@@ -538,6 +448,7 @@ class Game2048:
             if (moved) {
                 score += moveScore;
                 moves++;
+                moveLog += 'L';
                 addRandomTile();
                 updateMaxTile();
                 updateDisplay();
@@ -577,6 +488,7 @@ class Game2048:
             if (moved) {
                 score += moveScore;
                 moves++;
+                moveLog += 'R';
                 addRandomTile();
                 updateMaxTile();
                 updateDisplay();
@@ -622,6 +534,7 @@ class Game2048:
             if (moved) {
                 score += moveScore;
                 moves++;
+                moveLog += 'U';
                 addRandomTile();
                 updateMaxTile();
                 updateDisplay();
@@ -667,6 +580,7 @@ class Game2048:
             if (moved) {
                 score += moveScore;
                 moves++;
+                moveLog += 'D';
                 addRandomTile();
                 updateMaxTile();
                 updateDisplay();
@@ -726,13 +640,10 @@ class Game2048:
             
             // Отправляем результаты в Telegram
             if (window.Telegram && window.Telegram.WebApp) {
+                // Счет пересчитывается на сервере, отправляем только ходы
                 window.Telegram.WebApp.sendData(JSON.stringify({
-                    score: score,
-                    max_tile: maxTile,
-                    moves: moves,
-                    final_score: finalScore,
-                    time_seconds: (Date.now() - startTime) / 1000,
-                    won: won
+                    seed: seed,
+                    moves: moveLog
                 }));
             }
         }
@@ -779,4 +690,4 @@ class Game2048:
     </script>
 </body>
 </html>
-        """
+        """.replace("__SEED__", str(int(seed)))
@@ -10,9 +10,18 @@ from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_applicati
 from aiohttp import web
 
 from app.config import settings
-from app.database.connection import db
+from app.database.migrate import check_schema_version
+from app.database.redis_client import redis_client
 from app.bot.handlers import register_handlers
 from app.bot.middlewares import register_middlewares
+from app.bot.storage import create_fsm_storage
+from app.services.validation_service import shutdown_executor
+from app.services.ledger_service import run_snapshot_worker
+from app.services.rating_index import run_rating_index_worker
+from app.services.matchmaking import run_matchmaking_worker
+from app.services.tournament_service import run_deadline_worker
+from app.services.outbox import run_outbox_worker
+from app.database.session import run_session_metrics_worker
 
 # Настройка логирования
 logging.basicConfig(
@@ -21,14 +30,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Фоновые задачи, работающие вместе с диспетчером
+background_tasks: list[asyncio.Task] = []
+
 
 async def on_startup(bot: Bot):
     """Инициализация при запуске"""
     logger.info("Starting bot...")
     
-    # Создание таблиц базы данных
-    await db.create_tables()
-    logger.info("Database tables created")
+    # Схема создается миграциями (python -m app.database.migrate),
+    # при старте только сверяем ее ревизию
+    await check_schema_version()
+    logger.info("Database schema is up to date")
+    
+    # Обновление снимков балансов по книге операций
+    background_tasks.append(
+        asyncio.create_task(run_snapshot_worker(settings.LEDGER_SNAPSHOT_INTERVAL))
+    )
+    
+    # Перестроение индекса глобального рейтинга
+    background_tasks.append(
+        asyncio.create_task(run_rating_index_worker(settings.RATING_INDEX_REBUILD_INTERVAL))
+    )
+    
+    # Подбор соперников для дуэлей
+    background_tasks.append(
+        asyncio.create_task(run_matchmaking_worker(settings.MATCHMAKING_INTERVAL))
+    )
+    
+    # Сроки регистрации и завершения турниров
+    background_tasks.append(
+        asyncio.create_task(run_deadline_worker())
+    )
+    
+    # Выплаты и уведомления из outbox
+    background_tasks.append(
+        asyncio.create_task(run_outbox_worker(bot, settings.OUTBOX_INTERVAL))
+    )
+    
+    # Доля апдейтов, которым понадобилось соединение с БД
+    background_tasks.append(
+        asyncio.create_task(run_session_metrics_worker(settings.SESSION_METRICS_INTERVAL))
+    )
     
     # Установка webhook (если используется)
     if settings.WEBHOOK_URL:
@@ -45,6 +88,16 @@ async def on_shutdown(bot: Bot):
     """Очистка при завершении"""
     logger.info("Shutting down bot...")
     await bot.delete_webhook()
+    
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    
+    # Останавливаем пул процессов проверки игр
+    shutdown_executor()
+    
+    await redis_client.aclose()
 
 
 def create_bot() -> Bot:
@@ -57,7 +110,8 @@ def create_bot() -> Bot:
 
 def create_dispatcher() -> Dispatcher:
     """Создание диспетчера"""
-    dp = Dispatcher()
+    # Состояния диалогов в Redis общие для всех процессов бота
+    dp = Dispatcher(storage=create_fsm_storage())
     
     # Регистрация middleware
     register_middlewares(dp)
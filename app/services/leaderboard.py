@@ -0,0 +1,137 @@
+"""
+Таблица результатов идущих турниров
+"""
+import bisect
+import logging
+from typing import Dict, List, Optional, Tuple
+from redis.exceptions import RedisError
+
+from app.config import settings
+from app.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "leaderboard:v1"
+
+# Строка таблицы: (место, id пользователя, счет)
+Standing = Tuple[int, int, float]
+
+
+class RedisLeaderboard:
+    """
+    Таблица результатов в сортированных множествах Redis
+
+    Один ключ на турнир; вставка, место игрока и выборка окна стоят O(log N).
+    Ошибки Redis не ломают отправку результата: таблица лишь отстает
+    до следующей отправки игрока.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(tournament_id: int) -> str:
+        return f"{KEY_PREFIX}:{tournament_id}"
+
+    async def submit(self, tournament_id: int, user_id: int, score: float, best_only: bool = False):
+        """Записать результат игрока; при best_only сохраняется лучший результат"""
+        key = self._key(tournament_id)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zadd(key, {str(user_id): score}, gt=best_only)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Leaderboard update failed: {e}")
+
+    async def top(self, tournament_id: int, limit: int = 10) -> List[Standing]:
+        """Первые limit мест"""
+        return await self._range(tournament_id, 0, limit - 1)
+
+    async def rank(self, tournament_id: int, user_id: int) -> Optional[int]:
+        """Место игрока (с 1) или None, если он еще не присылал результат"""
+        try:
+            rank = await redis_client.zrevrank(self._key(tournament_id), str(user_id))
+        except RedisError as e:
+            logger.warning(f"Leaderboard read failed: {e}")
+            return None
+
+        return rank + 1 if rank is not None else None
+
+    async def around(self, tournament_id: int, user_id: int, radius: int = 2) -> List[Standing]:
+        """Игрок и его соседи по таблице"""
+        rank = await self.rank(tournament_id, user_id)
+        if rank is None:
+            return []
+
+        start = max(rank - 1 - radius, 0)
+        return await self._range(tournament_id, start, rank - 1 + radius)
+
+    async def _range(self, tournament_id: int, start: int, end: int) -> List[Standing]:
+        try:
+            rows = await redis_client.zrevrange(
+                self._key(tournament_id), start, end, withscores=True
+            )
+        except RedisError as e:
+            logger.warning(f"Leaderboard read failed: {e}")
+            return []
+
+        return [
+            (start + i + 1, int(member), score)
+            for i, (member, score) in enumerate(rows)
+        ]
+
+
+class MemoryLeaderboard:
+    """Таблица результатов в памяти процесса (для тестов и запуска без Redis)"""
+
+    def __init__(self):
+        # По турниру: отсортированный список (-счет, id) и текущие счета игроков
+        self._boards: Dict[int, Tuple[List[Tuple[float, int]], Dict[int, float]]] = {}
+
+    async def submit(self, tournament_id: int, user_id: int, score: float, best_only: bool = False):
+        entries, scores = self._boards.setdefault(tournament_id, ([], {}))
+
+        current = scores.get(user_id)
+        if current is not None:
+            if best_only and score <= current:
+                return
+            del entries[bisect.bisect_left(entries, (-current, user_id))]
+
+        scores[user_id] = score
+        bisect.insort(entries, (-score, user_id))
+
+    async def top(self, tournament_id: int, limit: int = 10) -> List[Standing]:
+        return self._range(tournament_id, 0, limit - 1)
+
+    async def rank(self, tournament_id: int, user_id: int) -> Optional[int]:
+        entries, scores = self._boards.get(tournament_id, ([], {}))
+        if user_id not in scores:
+            return None
+        return bisect.bisect_left(entries, (-scores[user_id], user_id)) + 1
+
+    async def around(self, tournament_id: int, user_id: int, radius: int = 2) -> List[Standing]:
+        rank = await self.rank(tournament_id, user_id)
+        if rank is None:
+            return []
+
+        start = max(rank - 1 - radius, 0)
+        return self._range(tournament_id, start, rank - 1 + radius)
+
+    def _range(self, tournament_id: int, start: int, end: int) -> List[Standing]:
+        entries, _ = self._boards.get(tournament_id, ([], {}))
+        return [
+            (start + i + 1, user_id, -score)
+            for i, (score, user_id) in enumerate(entries[start:end + 1])
+        ]
+
+
+def create_leaderboard():
+    """Создать таблицу результатов по настройке LEADERBOARD_BACKEND"""
+    if settings.LEADERBOARD_BACKEND == "memory":
+        return MemoryLeaderboard()
+    return RedisLeaderboard(ttl=settings.LEADERBOARD_TTL)
+
+
+# Глобальный экземпляр таблицы результатов
+leaderboard = create_leaderboard()
@@ -0,0 +1,267 @@
+"""
+Сервис учета операций по балансам (бухгалтерская книга)
+"""
+import asyncio
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Optional, List, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, literal, true
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database.connection import db
+from app.utils.pagination import Page, paginate
+from app.database.models import (
+    LedgerEntry, LedgerSnapshot, LedgerAccount, Transaction, TransactionType, User
+)
+
+logger = logging.getLogger(__name__)
+
+# Счет, с которым пользователь обменивается деньгами при каждом типе операции
+COUNTER_ACCOUNTS = {
+    TransactionType.DEPOSIT: LedgerAccount.EXTERNAL,
+    TransactionType.WITHDRAWAL: LedgerAccount.EXTERNAL,
+    TransactionType.TOURNAMENT_FEE: LedgerAccount.TOURNAMENTS,
+    TransactionType.PRIZE: LedgerAccount.TOURNAMENTS,
+    TransactionType.REFERRAL_BONUS: LedgerAccount.BONUSES,
+    TransactionType.REFUND: LedgerAccount.TOURNAMENTS,
+}
+
+RECONCILE_CHUNK_SIZE = 1000
+
+
+class LedgerService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _lock_users(self, user_ids: Iterable[int]):
+        """
+        Заблокировать строки пользователей до записи их проводок
+
+        Проводки пользователя пишутся только под блокировкой его строки,
+        поэтому их id растут в порядке фиксации; на этом держатся снимки
+        (refresh_snapshots). Порядок по id исключает взаимные блокировки,
+        строки, уже заблокированные транзакцией, повторно не ждут.
+        """
+        await self.session.execute(
+            select(User.id)
+            .where(User.id.in_(set(user_ids)))
+            .order_by(User.id)
+            .with_for_update()
+        )
+
+    async def post(
+        self,
+        user_id: int,
+        amount: float,
+        entry_type: TransactionType,
+        description: Optional[str] = None,
+        transaction: Optional[Transaction] = None
+    ):
+        """
+        Записать операцию по кошельку пользователя
+
+        Положительная сумма зачисляется пользователю, отрицательная списывается.
+        Встречная проводка уходит на счет из COUNTER_ACCOUNTS. Проводки
+        добавляются в текущую транзакцию вместе с изменением баланса.
+        """
+        amount = Decimal(str(amount))
+        await self._lock_users([user_id])
+
+        self.session.add_all([
+            LedgerEntry(
+                account=LedgerAccount.USER,
+                user_id=user_id,
+                amount=amount,
+                entry_type=entry_type,
+                description=description,
+                transaction=transaction
+            ),
+            LedgerEntry(
+                account=COUNTER_ACCOUNTS[entry_type],
+                amount=-amount,
+                entry_type=entry_type,
+                description=description,
+                transaction=transaction
+            )
+        ])
+
+    async def post_many(
+        self,
+        entry_type: TransactionType,
+        postings: List[Tuple[int, Decimal, Optional[int]]],
+        description: Optional[str] = None
+    ):
+        """
+        Записать пачку операций одного типа одним INSERT
+
+        postings - список (user_id, сумма, id транзакции).
+        """
+        now = datetime.utcnow()
+        counter_account = COUNTER_ACCOUNTS[entry_type]
+        rows = []
+
+        for user_id, amount, transaction_id in postings:
+            amount = Decimal(str(amount))
+            rows.append({
+                "account": LedgerAccount.USER,
+                "user_id": user_id,
+                "amount": amount,
+                "entry_type": entry_type,
+                "description": description,
+                "transaction_id": transaction_id,
+                "created_at": now
+            })
+            rows.append({
+                "account": counter_account,
+                "user_id": None,
+                "amount": -amount,
+                "entry_type": entry_type,
+                "description": description,
+                "transaction_id": transaction_id,
+                "created_at": now
+            })
+
+        if rows:
+            await self._lock_users(user_id for user_id, _, _ in postings)
+            await self.session.execute(insert(LedgerEntry), rows)
+
+    async def get_balance(self, user_id: int) -> Decimal:
+        """Получить баланс по книге: снимок плюс проводки после него"""
+        snapshot = (
+            select(LedgerSnapshot.balance, LedgerSnapshot.last_entry_id)
+            .where(LedgerSnapshot.user_id == user_id)
+            .subquery()
+        )
+        last_entry_id = func.coalesce(select(snapshot.c.last_entry_id).scalar_subquery(), 0)
+        tail = (
+            select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+            .where(
+                LedgerEntry.user_id == user_id,
+                LedgerEntry.id > last_entry_id
+            )
+            .scalar_subquery()
+        )
+
+        result = await self.session.execute(
+            select(func.coalesce(select(snapshot.c.balance).scalar_subquery(), 0) + tail)
+        )
+        return result.scalar()
+
+    async def get_history(
+        self,
+        user_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 10
+    ) -> Page:
+        """Получить страницу проводок пользователя (от новых к старым)"""
+        return await paginate(
+            self.session,
+            select(LedgerEntry).where(LedgerEntry.user_id == user_id),
+            [LedgerEntry.id],
+            cursor=cursor,
+            limit=limit
+        )
+
+    async def refresh_snapshots(self) -> List[int]:
+        """
+        Дописать в снимки проводки, появившиеся после них
+
+        Граница у каждого снимка своя (last_entry_id пользователя). Проводки
+        пользователя post и post_many пишут под блокировкой его строки,
+        поэтому их id растут в порядке фиксации, а поздно зафиксированные
+        проводки других пользователей не пропускаются.
+        Хвост каждого счета читается по индексу (user_id, id); снимок
+        записывается целиком, поэтому повторный или параллельный запуск
+        не удваивает суммы. Возвращает id пользователей, чьи снимки изменились.
+        """
+        tail = (
+            select(
+                func.sum(LedgerEntry.amount).label("amount"),
+                func.max(LedgerEntry.id).label("last_entry_id")
+            )
+            .where(
+                LedgerEntry.user_id == User.id,
+                LedgerEntry.account == LedgerAccount.USER,
+                LedgerEntry.id > func.coalesce(LedgerSnapshot.last_entry_id, 0)
+            )
+            .lateral("tail")
+        )
+
+        stmt = insert(LedgerSnapshot).from_select(
+            ["user_id", "balance", "last_entry_id", "updated_at"],
+            select(
+                User.id,
+                func.coalesce(LedgerSnapshot.balance, 0) + tail.c.amount,
+                tail.c.last_entry_id,
+                literal(datetime.utcnow())
+            )
+            .select_from(User)
+            .outerjoin(LedgerSnapshot, LedgerSnapshot.user_id == User.id)
+            .join(tail, true())
+            .where(tail.c.last_entry_id.is_not(None))
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LedgerSnapshot.user_id],
+            set_={
+                "balance": stmt.excluded.balance,
+                "last_entry_id": stmt.excluded.last_entry_id,
+                "updated_at": stmt.excluded.updated_at
+            },
+            # Снимок, посчитанный по более старому состоянию, не затирает новый
+            where=LedgerSnapshot.last_entry_id < stmt.excluded.last_entry_id
+        ).returning(LedgerSnapshot.user_id)
+
+        result = await self.session.execute(stmt)
+        user_ids = result.scalars().all()
+        await self.session.commit()
+
+        return user_ids
+
+    async def reconcile(self, user_ids: List[int]) -> List[Tuple[int, Decimal, Decimal]]:
+        """Сверить users.balance с книгой: (user_id, баланс, баланс по книге) для расхождений"""
+        tail = (
+            select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+            .where(
+                LedgerEntry.user_id == LedgerSnapshot.user_id,
+                LedgerEntry.id > LedgerSnapshot.last_entry_id
+            )
+            .correlate(LedgerSnapshot)
+            .scalar_subquery()
+        )
+        ledger_balance = LedgerSnapshot.balance + tail
+
+        mismatches = []
+        for i in range(0, len(user_ids), RECONCILE_CHUNK_SIZE):
+            result = await self.session.execute(
+                select(User.id, User.balance, ledger_balance)
+                .join(LedgerSnapshot, LedgerSnapshot.user_id == User.id)
+                .where(
+                    User.id.in_(user_ids[i:i + RECONCILE_CHUNK_SIZE]),
+                    User.balance != ledger_balance
+                )
+            )
+            mismatches.extend(result.all())
+
+        return mismatches
+
+
+async def run_snapshot_worker(interval: int):
+    """Периодически обновлять снимки балансов и сверять их с users.balance"""
+    while True:
+        try:
+            async with db.async_session() as session:
+                ledger = LedgerService(session)
+                user_ids = await ledger.refresh_snapshots()
+                mismatches = await ledger.reconcile(user_ids) if user_ids else []
+
+            for user_id, balance, ledger_balance in mismatches:
+                logger.error(
+                    f"Ledger mismatch for user {user_id}: "
+                    f"balance {balance}, ledger {ledger_balance}"
+                )
+        except Exception as e:
+            logger.error(f"Ledger snapshot refresh failed: {e}")
+
+        await asyncio.sleep(interval)
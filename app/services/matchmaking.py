@@ -0,0 +1,216 @@
+"""
+Подбор соперников для дуэлей
+"""
+import asyncio
+import logging
+import time
+from typing import List, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from app.config import settings
+from app.database.connection import db
+from app.database.models import GameType, User
+from app.database.redis_client import redis_client
+from app.services.outbox import NOTIFY, outbox
+from app.services.tournament_service import TournamentService
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "matchmaking:v1"
+BUCKETS_KEY = f"{KEY_PREFIX}:buckets"
+WAITING_KEY = f"{KEY_PREFIX}:waiting"
+LOCK_KEY = f"{KEY_PREFIX}:lock"
+
+DUEL_GAMES = ("clicker", "reaction", "2048")
+DUEL_FEES = (100, 500, 1000)
+
+# Игрок в очереди: (id, рейтинг, время постановки в очередь)
+QueueEntry = Tuple[int, float, float]
+
+
+def rating_window(waited: float) -> float:
+    """Допустимая разница рейтингов после ожидания waited секунд"""
+    return min(
+        settings.MATCHMAKING_BASE_WINDOW + settings.MATCHMAKING_WINDOW_GROWTH * waited,
+        settings.MATCHMAKING_MAX_WINDOW
+    )
+
+
+def find_pairs(entries: List[QueueEntry], now: float) -> List[Tuple[QueueEntry, QueueEntry]]:
+    """
+    Разбить очередь, упорядоченную по рейтингу, на пары
+
+    Ближайший по рейтингу соперник всегда соседний, поэтому достаточно одного
+    прохода по соседям. Пара подходит, если разница рейтингов укладывается
+    в окно обоих игроков: окно растет с ожиданием.
+    """
+    pairs = []
+    i = 0
+
+    while i + 1 < len(entries):
+        first, second = entries[i], entries[i + 1]
+        allowed = min(rating_window(now - first[2]), rating_window(now - second[2]))
+
+        if second[1] - first[1] <= allowed:
+            pairs.append((first, second))
+            i += 2
+        else:
+            i += 1
+
+    return pairs
+
+
+class Matchmaker:
+    """
+    Очереди подбора в Redis: сортированное множество по рейтингу на каждую
+    пару (игра, взнос)
+
+    Постановка и снятие с очереди стоят O(log N). Подбор выполняет один
+    процесс за раз (блокировка в Redis), поэтому очередь общая для всех
+    процессов бота.
+    """
+
+    @staticmethod
+    def _queue_key(bucket: str) -> str:
+        return f"{KEY_PREFIX}:queue:{bucket}"
+
+    async def enqueue(self, user_id: int, rating: int, game: str, entry_fee: int) -> bool:
+        """Поставить игрока в очередь; False, если он уже ждет соперника"""
+        bucket = f"{game}:{entry_fee}"
+
+        if not await redis_client.hsetnx(WAITING_KEY, str(user_id), f"{bucket}:{time.time()}"):
+            return False
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self._queue_key(bucket), {str(user_id): rating})
+            pipe.sadd(BUCKETS_KEY, bucket)
+            await pipe.execute()
+        return True
+
+    async def dequeue(self, user_id: int) -> bool:
+        """Снять игрока с очереди"""
+        raw = await redis_client.hget(WAITING_KEY, str(user_id))
+        if raw is None:
+            return False
+
+        bucket = raw.decode().rsplit(":", 1)[0]
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._queue_key(bucket), str(user_id))
+            pipe.hdel(WAITING_KEY, str(user_id))
+            await pipe.execute()
+        return True
+
+    async def run_once(self):
+        """Один проход подбора по всем очередям"""
+        lock_ttl = max(int(settings.MATCHMAKING_INTERVAL * 5000), 5000)
+        if not await redis_client.set(LOCK_KEY, "1", nx=True, px=lock_ttl):
+            return
+
+        try:
+            for raw_bucket in await redis_client.smembers(BUCKETS_KEY):
+                await self._match_bucket(raw_bucket.decode())
+        finally:
+            await redis_client.delete(LOCK_KEY)
+
+    async def _match_bucket(self, bucket: str):
+        key = self._queue_key(bucket)
+        rows = await redis_client.zrange(key, 0, -1, withscores=True)
+
+        if len(rows) < 2:
+            if not rows:
+                await redis_client.srem(BUCKETS_KEY, bucket)
+            return
+
+        user_ids = [member.decode() for member, _ in rows]
+        waiting = await redis_client.hmget(WAITING_KEY, user_ids)
+
+        entries = []
+        for (member, rating), raw in zip(rows, waiting):
+            joined_at = float(raw.decode().rsplit(":", 1)[1]) if raw else time.time()
+            entries.append((int(member), rating, joined_at))
+
+        game, entry_fee = bucket.split(":")
+        for first, second in find_pairs(entries, time.time()):
+            if not await self._claim(key, first, second):
+                continue
+            try:
+                await self._start_duel(bucket, GameType(game), int(entry_fee), first, second)
+            except Exception as e:
+                logger.error(f"Failed to start duel in {bucket}: {e}")
+                await self._requeue(bucket, first)
+                await self._requeue(bucket, second)
+
+    async def _claim(self, key: str, first: QueueEntry, second: QueueEntry) -> bool:
+        """Забрать пару из очереди; игрок мог успеть отказаться от подбора"""
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.zrem(key, str(first[0]))
+            pipe.zrem(key, str(second[0]))
+            removed = await pipe.execute()
+
+        if all(removed):
+            return True
+
+        # Возвращаем в очередь того, кто еще ждет
+        for entry, was_removed in zip((first, second), removed):
+            if was_removed:
+                await redis_client.zadd(key, {str(entry[0]): entry[1]})
+        return False
+
+    async def _requeue(self, bucket: str, entry: QueueEntry):
+        """Вернуть игрока в очередь с прежним временем ожидания"""
+        await redis_client.zadd(self._queue_key(bucket), {str(entry[0]): entry[1]})
+
+    async def _start_duel(
+        self,
+        bucket: str,
+        game_type: GameType,
+        entry_fee: int,
+        first: QueueEntry,
+        second: QueueEntry
+    ):
+        """Создать дуэль; уведомления игрокам уходят через outbox"""
+        async with db.async_session() as session:
+            tournament_service = TournamentService(session)
+            tournament, failed_user_id = await tournament_service.create_duel(
+                (first[0], second[0]), game_type, entry_fee
+            )
+
+            if tournament is None:
+                telegram_id = await session.scalar(
+                    select(User.telegram_id).where(User.id == failed_user_id)
+                )
+                outbox.add(session, NOTIFY, {
+                    "telegram_id": telegram_id,
+                    "text": "❌ Соперник найден, но на балансе не хватает средств для взноса. "
+                            "Пополните баланс и встаньте в очередь снова: /duel"
+                })
+                await session.commit()
+
+        if tournament is None:
+            # Игрок без средств выбывает, его соперник ждет дальше
+            for entry in (first, second):
+                if entry[0] == failed_user_id:
+                    await redis_client.hdel(WAITING_KEY, str(entry[0]))
+                else:
+                    await self._requeue(bucket, entry)
+            return
+
+        await redis_client.hdel(WAITING_KEY, str(first[0]), str(second[0]))
+
+
+async def run_matchmaking_worker(interval: float):
+    """Подбирать пары в очередях дуэлей"""
+    while True:
+        try:
+            await matchmaker.run_once()
+        except RedisError as e:
+            logger.warning(f"Matchmaking pass failed: {e}")
+        except Exception as e:
+            logger.error(f"Matchmaking pass failed: {e}")
+
+        await asyncio.sleep(interval)
+
+
+# Глобальный экземпляр подбора соперников
+matchmaker = Matchmaker()
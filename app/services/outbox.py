@@ -0,0 +1,232 @@
+"""
+Исходящие сообщения (transactional outbox)
+"""
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+from sqlalchemy import select, update, case, values, column, BigInteger, DateTime, Text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.connection import db
+from app.database.models import OutboxMessage, OutboxStatus
+
+logger = logging.getLogger(__name__)
+
+# Сообщение пользователю в Telegram: {"telegram_id": ..., "text": ...}
+NOTIFY = "notify"
+
+Handler = Callable[[Bot, Dict[str, Any]], Awaitable[None]]
+
+
+class Outbox:
+    """
+    Внешние действия, записанные в таблицу outbox
+
+    Сообщение добавляется в ту же транзакцию, что и изменение данных: оно
+    появляется, только если изменение зафиксировано, и не теряется при
+    падении процесса. Диспетчер забирает готовые сообщения пачками
+    (FOR UPDATE SKIP LOCKED), выполняет их параллельно и повторяет
+    неудачные с экспоненциальной задержкой. Обработчики должны быть
+    идемпотентны: после падения диспетчера сообщение выполнится еще раз.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, Handler] = {}
+
+    def handler(self, kind: str):
+        """Зарегистрировать обработчик сообщений вида kind"""
+        def decorator(func: Handler) -> Handler:
+            self._handlers[kind] = func
+            return func
+        return decorator
+
+    def add(
+        self,
+        session: AsyncSession,
+        kind: str,
+        payload: Dict[str, Any],
+        available_at: Optional[datetime] = None
+    ):
+        """Добавить сообщение в текущую транзакцию"""
+        session.add(OutboxMessage(
+            kind=kind,
+            payload=json.dumps(payload, ensure_ascii=False),
+            available_at=available_at or datetime.utcnow()
+        ))
+
+    async def add_many(self, session: AsyncSession, kind: str, payloads: List[Dict[str, Any]]):
+        """Добавить пачку сообщений в текущую транзакцию одним INSERT"""
+        if not payloads:
+            return
+
+        now = datetime.utcnow()
+        await session.execute(
+            insert(OutboxMessage),
+            [
+                {
+                    "kind": kind,
+                    "payload": json.dumps(payload, ensure_ascii=False),
+                    "status": OutboxStatus.PENDING,
+                    "attempts": 0,
+                    "created_at": now,
+                    "available_at": now
+                }
+                for payload in payloads
+            ]
+        )
+
+    async def dispatch_once(self, bot: Bot) -> int:
+        """Выполнить одну пачку готовых сообщений; возвращает ее размер"""
+        batch = await self._claim()
+        if not batch:
+            return 0
+
+        semaphore = asyncio.Semaphore(settings.OUTBOX_CONCURRENCY)
+
+        async def run(kind: str, payload: str):
+            async with semaphore:
+                await self._handlers[kind](bot, json.loads(payload))
+
+        results = await asyncio.gather(
+            *(run(kind, payload) for _, kind, payload, _ in batch),
+            return_exceptions=True
+        )
+
+        now = datetime.utcnow()
+        sent = []
+        retries = []
+        for (message_id, kind, _, attempts), error in zip(batch, results):
+            if error is None:
+                sent.append(message_id)
+                continue
+
+            if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+                logger.error(f"Outbox message {message_id} ({kind}) failed permanently: {error!r}")
+            else:
+                logger.warning(f"Outbox message {message_id} ({kind}) failed: {error!r}")
+            retries.append((message_id, now + _backoff(attempts), repr(error)))
+
+        await self._finish(sent, retries, now)
+        return len(batch)
+
+    async def _claim(self) -> List[tuple]:
+        """
+        Забрать пачку готовых сообщений
+
+        Выданные сообщения откладываются на OUTBOX_LEASE: если процесс упадет,
+        не отчитавшись, они снова станут готовы и выполнятся повторно.
+        """
+        now = datetime.utcnow()
+        ready = (
+            select(OutboxMessage.id)
+            .where(
+                OutboxMessage.status == OutboxStatus.PENDING,
+                OutboxMessage.available_at <= now
+            )
+            .order_by(OutboxMessage.available_at)
+            .limit(settings.OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+
+        async with db.async_session() as session:
+            result = await session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ready))
+                .values(
+                    attempts=OutboxMessage.attempts + 1,
+                    available_at=now + timedelta(seconds=settings.OUTBOX_LEASE)
+                )
+                .returning(
+                    OutboxMessage.id,
+                    OutboxMessage.kind,
+                    OutboxMessage.payload,
+                    OutboxMessage.attempts
+                )
+                .execution_options(synchronize_session=False)
+            )
+            batch = result.all()
+            await session.commit()
+
+        return batch
+
+    async def _finish(self, sent: List[int], retries: List[tuple], now: datetime):
+        """Отметить выполненные сообщения и отложить неудачные, по запросу на группу"""
+        async with db.async_session() as session:
+            if sent:
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(sent))
+                    .values(status=OutboxStatus.SENT, sent_at=now, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+
+            if retries:
+                failures = values(
+                    column("id", BigInteger),
+                    column("available_at", DateTime),
+                    column("error", Text),
+                    name="failures"
+                ).data(retries)
+
+                await session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id == failures.c.id)
+                    .values(
+                        status=case(
+                            (
+                                OutboxMessage.attempts >= settings.OUTBOX_MAX_ATTEMPTS,
+                                OutboxStatus.FAILED
+                            ),
+                            else_=OutboxStatus.PENDING
+                        ),
+                        available_at=failures.c.available_at,
+                        last_error=failures.c.error
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+
+            await session.commit()
+
+
+def _backoff(attempts: int) -> timedelta:
+    """Экспоненциальная задержка со случайным разбросом, чтобы повторы не шли залпом"""
+    delay = min(
+        settings.OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1),
+        settings.OUTBOX_BACKOFF_MAX
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+async def run_outbox_worker(bot: Bot, interval: float):
+    """Выполнять исходящие сообщения"""
+    while True:
+        try:
+            processed = await outbox.dispatch_once(bot)
+        except Exception as e:
+            logger.error(f"Outbox dispatch failed: {e}")
+            processed = 0
+
+        # После полной пачки очередь, скорее всего, не пуста
+        if processed < settings.OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(interval)
+
+
+# Глобальный экземпляр очереди исходящих сообщений
+outbox = Outbox()
+
+
+@outbox.handler(NOTIFY)
+async def send_notification(bot: Bot, payload: Dict[str, Any]):
+    """Отправить сообщение пользователю"""
+    try:
+        await bot.send_message(payload["telegram_id"], payload["text"])
+    except TelegramForbiddenError:
+        # Пользователь заблокировал бота, повтор не поможет
+        logger.info(f"User {payload['telegram_id']} blocked the bot, notification dropped")
@@ -3,26 +3,44 @@
 """
 import asyncio
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import (
+    select, update, func, literal, text, values, column, BigInteger, DateTime, Integer, Numeric
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 
-from app.database.models import User, Transaction, TransactionType, TransactionStatus
+from app.database.models import (
+    User, Participant, Transaction, TransactionType, TransactionStatus
+)
 from app.config import settings
+from app.database.connection import db
+from app.services.ledger_service import LedgerService
+from app.services.outbox import NOTIFY, outbox
+from app.services.user_cache import user_cache
+from app.services.user_service import UserService
 
 
 class PaymentService:
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.ledger = LedgerService(session)
     
     async def create_deposit_request(
         self,
         user_id: int,
         amount: float,
-        payment_method: str
+        payment_method: str,
+        idempotency_key: Optional[str] = None
     ) -> Transaction:
         """Создать запрос на пополнение"""
+        if idempotency_key:
+            existing_transaction = await self.get_by_idempotency_key(idempotency_key)
+            if existing_transaction:
+                return existing_transaction
+        
         transaction = await self.session.execute(
             select(Transaction)
             .where(
@@ -30,6 +48,8 @@ class PaymentService:
                 Transaction.transaction_type == TransactionType.DEPOSIT,
                 Transaction.status == TransactionStatus.PENDING
             )
+            .order_by(Transaction.created_at.desc())
+            .limit(1)
         )
         existing_transaction = transaction.scalar_one_or_none()
         
@@ -42,11 +62,18 @@ class PaymentService:
             transaction_type=TransactionType.DEPOSIT,
             description=f"Пополнение через {payment_method}",
             payment_method=payment_method,
-            status=TransactionStatus.PENDING
+            status=TransactionStatus.PENDING,
+            idempotency_key=idempotency_key
         )
         
         self.session.add(new_transaction)
-        await self.session.commit()
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # Параллельный запрос с тем же ключом успел создать транзакцию
+            await self.session.rollback()
+            return await self.get_by_idempotency_key(idempotency_key)
+        
         await self.session.refresh(new_transaction)
         
         return new_transaction
@@ -57,33 +84,49 @@ class PaymentService:
         amount: float,
         external_id: str
     ) -> bool:
-        """Обработать платеж через Telegram Stars"""
+        """
+        Обработать платеж через Telegram Stars
+        
+        Платеж идентифицируется external_id платежной системы. Повторное
+        уведомление о том же платеже возвращает сохраненный результат
+        одним чтением по уникальному индексу, не трогая баланс.
+        """
+        stored = await self.get_payment_status(external_id)
+        if stored is not None:
+            return stored == TransactionStatus.COMPLETED
+        
         try:
-            # Находим транзакцию
-            result = await self.session.execute(
-                select(Transaction)
+            # Забираем самую свежую ожидающую транзакцию пополнения; параллельный
+            # обработчик пропустит ее и не сможет провести дважды
+            pending = (
+                select(Transaction.id)
                 .where(
                     Transaction.user_id == user_id,
                     Transaction.transaction_type == TransactionType.DEPOSIT,
                     Transaction.status == TransactionStatus.PENDING
                 )
                 .order_by(Transaction.created_at.desc())
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
             )
-            transaction = result.scalar_one_or_none()
-            
-            if not transaction:
-                return False
-            
-            # Обновляем транзакцию
-            await self.session.execute(
+            result = await self.session.execute(
                 update(Transaction)
-                .where(Transaction.id == transaction.id)
+                .where(Transaction.id == pending)
                 .values(
                     status=TransactionStatus.COMPLETED,
                     external_id=external_id,
                     processed_at=datetime.utcnow()
                 )
+                .returning(Transaction.id, Transaction.description)
             )
+            row = result.one_or_none()
+            
+            if not row:
+                await self.session.rollback()
+                return False
+            
+            transaction_id, description = row
             
             # Обновляем баланс пользователя
             await self.session.execute(
@@ -95,29 +138,57 @@ class PaymentService:
                 )
             )
             
+            await self.ledger.post_many(
+                TransactionType.DEPOSIT, [(user_id, amount, transaction_id)], description
+            )
+            
             await self.session.commit()
+            await user_cache.invalidate(user_id)
             return True
             
+        except IntegrityError:
+            # Тот же платеж параллельно провел другой обработчик
+            await self.session.rollback()
+            return await self.get_payment_status(external_id) == TransactionStatus.COMPLETED
+            
         except Exception as e:
             await self.session.rollback()
             return False
     
+    async def get_payment_status(self, external_id: str) -> Optional[TransactionStatus]:
+        """Статус транзакции по ID в платежной системе"""
+        result = await self.session.execute(
+            select(Transaction.status).where(Transaction.external_id == external_id)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_by_idempotency_key(self, idempotency_key: str) -> Optional[Transaction]:
+        """Транзакция, созданная запросом с этим ключом"""
+        result = await self.session.execute(
+            select(Transaction).where(Transaction.idempotency_key == idempotency_key)
+        )
+        return result.scalar_one_or_none()
+    
     async def create_withdrawal_request(
         self,
         user_id: int,
         amount: float,
-        payment_details: Dict[str, Any]
+        payment_details: Dict[str, Any],
+        idempotency_key: Optional[str] = None
     ) -> Optional[Transaction]:
         """Создать запрос на вывод средств"""
+        if idempotency_key:
+            existing_transaction = await self.get_by_idempotency_key(idempotency_key)
+            if existing_transaction:
+                return existing_transaction
+        
         # Проверяем минимальную сумму
         if amount < settings.MIN_WITHDRAWAL_AMOUNT:
             return None
         
-        # Проверяем баланс
-        user_result = await self.session.execute(
-            select(User).where(User.id == user_id)
-        )
-        user = user_result.scalar_one_or_none()
+        # Предварительная проверка баланса по кэшу пользователя,
+        # окончательное списание атомарно выполняется в process_withdrawal
+        user = await UserService(self.session).get_user_by_id(user_id)
         
         if not user or user.balance < amount:
             return None
@@ -132,11 +203,18 @@ class PaymentService:
             transaction_type=TransactionType.WITHDRAWAL,
             description=f"Вывод средств. Комиссия: {commission:.2f} ₽",
             payment_method=payment_details.get("method", "unknown"),
-            status=TransactionStatus.PENDING
+            status=TransactionStatus.PENDING,
+            idempotency_key=idempotency_key
         )
         
         self.session.add(transaction)
-        await self.session.commit()
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # Параллельный запрос с тем же ключом успел создать транзакцию
+            await self.session.rollback()
+            return await self.get_by_idempotency_key(idempotency_key)
+        
         await self.session.refresh(transaction)
         
         return transaction
@@ -146,45 +224,79 @@ class PaymentService:
         transaction_id: int,
         external_id: Optional[str] = None
     ) -> bool:
-        """Обработать вывод средств"""
+        """
+        Обработать вывод средств
+        
+        Заявка переводится из PENDING условным UPDATE, поэтому повторный
+        вызов возвращает сохраненный результат и не списывает средства снова.
+        """
         try:
-            # Находим транзакцию
             result = await self.session.execute(
-                select(Transaction).where(Transaction.id == transaction_id)
-            )
-            transaction = result.scalar_one_or_none()
-            
-            if not transaction or transaction.status != TransactionStatus.PENDING:
-                return False
-            
-            # Обновляем транзакцию
-            await self.session.execute(
                 update(Transaction)
-                .where(Transaction.id == transaction_id)
+                .where(
+                    Transaction.id == transaction_id,
+                    Transaction.status == TransactionStatus.PENDING
+                )
                 .values(
                     status=TransactionStatus.COMPLETED,
                     external_id=external_id,
                     processed_at=datetime.utcnow()
                 )
+                .returning(Transaction.user_id, Transaction.amount, Transaction.description)
             )
+            row = result.one_or_none()
             
-            # Обновляем баланс пользователя
+            if not row:
+                await self.session.rollback()
+                status = await self.session.scalar(
+                    select(Transaction.status).where(Transaction.id == transaction_id)
+                )
+                return status == TransactionStatus.COMPLETED
+            
+            user_id, amount, description = row
+            
+            # Списываем средства, если их достаточно
+            new_balance = await self.debit_balance(user_id, amount)
+            
+            if new_balance is None:
+                await self.session.rollback()
+                return False
+            
+            # Обновляем статистику пользователя
             await self.session.execute(
                 update(User)
-                .where(User.id == transaction.user_id)
-                .values(
-                    balance=User.balance - transaction.amount,
-                    total_withdrawals=User.total_withdrawals + transaction.amount
-                )
+                .where(User.id == user_id)
+                .values(total_withdrawals=User.total_withdrawals + amount)
+            )
+            
+            await self.ledger.post_many(
+                TransactionType.WITHDRAWAL, [(user_id, -amount, transaction_id)], description
             )
             
             await self.session.commit()
+            await user_cache.invalidate(user_id)
             return True
             
         except Exception as e:
             await self.session.rollback()
             return False
     
+    async def debit_balance(self, user_id: int, amount: float) -> Optional[Decimal]:
+        """
+        Списать средства с баланса
+        
+        Проверка и списание выполняются одним UPDATE, поэтому параллельные
+        списания не могут увести баланс в минус. Возвращает новый баланс
+        или None, если средств недостаточно. Транзакцию не фиксирует.
+        """
+        result = await self.session.execute(
+            update(User)
+            .where(User.id == user_id, User.balance >= amount)
+            .values(balance=User.balance - amount)
+            .returning(User.balance)
+        )
+        return result.scalar_one_or_none()
+    
     async def calculate_commission(self, amount: float) -> float:
         """Рассчитать комиссию платформы"""
         if amount < 500:
@@ -202,64 +314,85 @@ class PaymentService:
     ) -> bool:
         """Обработать платеж за участие в турнире"""
         try:
-            # Проверяем баланс
-            user_result = await self.session.execute(
-                select(User).where(User.id == user_id)
-            )
-            user = user_result.scalar_one_or_none()
-            
-            if not user or user.balance < entry_fee:
+            if not await self.charge_entry_fee(user_id, tournament_id, entry_fee):
+                await self.session.rollback()
                 return False
             
-            # Создаем транзакцию
-            transaction = Transaction(
-                user_id=user_id,
-                amount=entry_fee,
-                transaction_type=TransactionType.TOURNAMENT_FEE,
-                description=f"Взнос за участие в турнире #{tournament_id}",
-                tournament_id=tournament_id,
-                status=TransactionStatus.COMPLETED,
-                processed_at=datetime.utcnow()
-            )
-            
-            self.session.add(transaction)
-            
-            # Обновляем баланс
-            await self.session.execute(
-                update(User)
-                .where(User.id == user_id)
-                .values(balance=User.balance - entry_fee)
-            )
-            
             await self.session.commit()
+            await user_cache.invalidate(user_id)
             return True
             
         except Exception as e:
             await self.session.rollback()
             return False
     
+    async def charge_entry_fee(
+        self,
+        user_id: int,
+        tournament_id: int,
+        entry_fee: float
+    ) -> bool:
+        """
+        Списать взнос за турнир без фиксации транзакции
+        
+        Взнос за турнир списывается с пользователя один раз: повторный
+        вызов находит транзакцию по ключу и ничего не списывает.
+        """
+        description = f"Взнос за участие в турнире #{tournament_id}"
+        transaction_id = await self._insert_once(
+            f"entry_fee:{tournament_id}:{user_id}",
+            user_id=user_id,
+            amount=entry_fee,
+            transaction_type=TransactionType.TOURNAMENT_FEE,
+            description=description,
+            tournament_id=tournament_id
+        )
+        
+        if transaction_id is None:
+            return True
+        
+        # Проверяем и списываем баланс одним запросом
+        new_balance = await self.debit_balance(user_id, entry_fee)
+        
+        if new_balance is None:
+            return False
+        
+        await self.ledger.post_many(
+            TransactionType.TOURNAMENT_FEE, [(user_id, -entry_fee, transaction_id)], description
+        )
+        return True
+    
     async def process_prize_payment(
         self,
         user_id: int,
         tournament_id: int,
-        prize_amount: float
+        prize_amount: float,
+        idempotency_key: Optional[str] = None
     ) -> bool:
-        """Обработать выплату приза"""
+        """
+        Обработать выплату приза
+        
+        Без явного ключа приз за турнир выплачивается пользователю один раз.
+        """
+        idempotency_key = idempotency_key or f"prize:{tournament_id}:{user_id}"
+        description = f"Приз за турнир #{tournament_id}"
+        
         try:
-            # Создаем транзакцию
-            transaction = Transaction(
+            transaction_id = await self._insert_once(
+                idempotency_key,
                 user_id=user_id,
                 amount=prize_amount,
                 transaction_type=TransactionType.PRIZE,
-                description=f"Приз за турнир #{tournament_id}",
-                tournament_id=tournament_id,
-                status=TransactionStatus.COMPLETED,
-                processed_at=datetime.utcnow()
+                description=description,
+                tournament_id=tournament_id
             )
             
-            self.session.add(transaction)
+            if transaction_id is None:
+                # Приз уже выплачен
+                await self.session.rollback()
+                return True
             
-            # Обновляем баланс и статистику
+            # Обновляем баланс и статистику; проводка пишется под блокировкой строки
             await self.session.execute(
                 update(User)
                 .where(User.id == user_id)
@@ -269,13 +402,334 @@ class PaymentService:
                 )
             )
             
+            await self.ledger.post_many(
+                TransactionType.PRIZE, [(user_id, prize_amount, transaction_id)], description
+            )
+            
             await self.session.commit()
+            await user_cache.invalidate(user_id)
             return True
             
         except Exception as e:
             await self.session.rollback()
             return False
     
+    async def _insert_once(self, idempotency_key: str, **values) -> Optional[int]:
+        """
+        Создать завершенную транзакцию с ключом идемпотентности
+        
+        Возвращает id новой транзакции или None, если транзакция с этим
+        ключом уже есть. Транзакцию БД не фиксирует.
+        """
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            insert(Transaction)
+            .values(
+                idempotency_key=idempotency_key,
+                status=TransactionStatus.COMPLETED,
+                created_at=now,
+                processed_at=now,
+                **values
+            )
+            .on_conflict_do_nothing(index_elements=["idempotency_key"])
+            .returning(Transaction.id)
+        )
+        return result.scalar_one_or_none()
+    
+    async def pay_tournament_prizes(
+        self,
+        tournament_id: int,
+        payouts: List[Tuple[int, Decimal]]
+    ) -> List[int]:
+        """
+        Выплатить призы турнира по местам участников
+
+        payouts - список (место, сумма). Выигрыши, транзакции, проводки и
+        балансы записываются несколькими пакетными запросами независимо от
+        числа участников. Транзакция не фиксируется: это делает вызывающий
+        код вместе с завершением турнира. Возвращает id победителей.
+        """
+        if not payouts:
+            return []
+        
+        prizes = values(
+            column("position", Integer),
+            column("amount", Numeric(10, 2)),
+            name="prizes"
+        ).data(payouts)
+        
+        result = await self.session.execute(
+            update(Participant)
+            .where(
+                Participant.tournament_id == tournament_id,
+                Participant.final_position == prizes.c.position
+            )
+            .values(winnings=prizes.c.amount)
+            .returning(Participant.user_id, Participant.winnings)
+            .execution_options(synchronize_session=False)
+        )
+        winners = result.all()
+        
+        if not winners:
+            return []
+        
+        now = datetime.utcnow()
+        description = f"Приз за турнир #{tournament_id}"
+        
+        result = await self.session.execute(
+            insert(Transaction).returning(Transaction.id, Transaction.user_id, Transaction.amount),
+            [
+                {
+                    "user_id": user_id,
+                    "amount": amount,
+                    "transaction_type": TransactionType.PRIZE,
+                    "status": TransactionStatus.COMPLETED,
+                    "description": description,
+                    "tournament_id": tournament_id,
+                    "idempotency_key": f"prize:{tournament_id}:{user_id}",
+                    "created_at": now,
+                    "processed_at": now
+                }
+                for user_id, amount in winners
+            ]
+        )
+        postings = [
+            (user_id, amount, transaction_id) for transaction_id, user_id, amount in result.all()
+        ]
+        
+        # Балансы и статистика победителей одним UPDATE ... FROM participants.
+        # UPDATE блокирует строки победителей, поэтому проводки пишутся после него
+        await self.session.execute(
+            update(User)
+            .where(
+                User.id == Participant.user_id,
+                Participant.tournament_id == tournament_id,
+                Participant.winnings > 0
+            )
+            .values(
+                balance=User.balance + Participant.winnings,
+                total_winnings=User.total_winnings + Participant.winnings
+            )
+            .execution_options(synchronize_session=False)
+        )
+        
+        await self.ledger.post_many(TransactionType.PRIZE, postings, description)
+        
+        return [user_id for user_id, _ in winners]
+    
+    async def refund_entry_fees(self, tournament_ids: List[int]) -> List[int]:
+        """
+        Вернуть взносы всем участникам турниров
+        
+        Транзакции возврата создаются одним INSERT ... SELECT по списанным
+        взносам, балансы пополняются одним UPDATE ... FROM. Уже возвращенные
+        взносы пропускает уникальный индекс, поэтому повторный вызов ничего
+        не начисляет. Транзакция не фиксируется. Возвращает id пользователей,
+        получивших возврат.
+        """
+        if not tournament_ids:
+            return []
+        
+        now = datetime.utcnow()
+        fees = (
+            select(
+                Transaction.user_id,
+                Transaction.amount,
+                literal(TransactionType.REFUND, Transaction.transaction_type.type),
+                literal(TransactionStatus.COMPLETED, Transaction.status.type),
+                func.concat("Возврат взноса за турнир #", Transaction.tournament_id),
+                Transaction.tournament_id,
+                literal(now, DateTime),
+                literal(now, DateTime)
+            )
+            .where(
+                Transaction.tournament_id.in_(tournament_ids),
+                Transaction.transaction_type == TransactionType.TOURNAMENT_FEE,
+                Transaction.status == TransactionStatus.COMPLETED
+            )
+        )
+        result = await self.session.execute(
+            insert(Transaction)
+            .from_select(
+                [
+                    "user_id", "amount", "transaction_type", "status", "description",
+                    "tournament_id", "created_at", "processed_at"
+                ],
+                fees
+            )
+            .on_conflict_do_nothing(
+                index_elements=["tournament_id", "user_id"],
+                index_where=text("transaction_type = 'REFUND'")
+            )
+            .returning(
+                Transaction.id, Transaction.user_id, Transaction.amount, Transaction.tournament_id
+            )
+        )
+        refunds = result.all()
+        
+        if not refunds:
+            return []
+        
+        # Проводки по книге: описание общее для возвратов одного турнира
+        postings: Dict[int, List[Tuple[int, Decimal, int]]] = {}
+        credits: Dict[int, Decimal] = {}
+        for transaction_id, user_id, amount, tournament_id in refunds:
+            postings.setdefault(tournament_id, []).append((user_id, amount, transaction_id))
+            credits[user_id] = credits.get(user_id, Decimal("0")) + amount
+        
+        # Балансы одним UPDATE ... FROM (VALUES ...): по строке на пользователя,
+        # даже если он возвращает взносы сразу за несколько турниров.
+        # UPDATE блокирует строки пользователей, поэтому проводки пишутся после него
+        amounts = values(
+            column("user_id", BigInteger),
+            column("amount", Numeric(10, 2)),
+            name="credits"
+        ).data(list(credits.items()))
+        
+        await self.session.execute(
+            update(User)
+            .where(User.id == amounts.c.user_id)
+            .values(balance=User.balance + amounts.c.amount)
+            .execution_options(synchronize_session=False)
+        )
+        
+        for tournament_id, tournament_postings in postings.items():
+            await self.ledger.post_many(
+                TransactionType.REFUND,
+                tournament_postings,
+                f"Возврат взноса за турнир #{tournament_id}"
+            )
+        
+        return list(credits)
+    
+    async def process_withdrawal_batch(self, limit: int) -> Tuple[List[int], List[int]]:
+        """
+        Провести пачку ожидающих выводов
+        
+        Заявки забираются SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько
+        обработчиков работают параллельно и не видят чужих заявок. Заявки
+        пользователя проводятся по порядку создания, пока их сумма укладывается
+        в баланс; заявка, на которую средств не хватает, отклоняется, а следующие
+        проверяются дальше. Списание, статусы, проводки и уведомления
+        записываются пакетными запросами в одной транзакции. Возвращает id
+        проведенных и отклоненных заявок.
+        """
+        result = await self.session.execute(
+            select(
+                Transaction.id,
+                Transaction.user_id,
+                Transaction.amount,
+                Transaction.description
+            )
+            .where(
+                Transaction.transaction_type == TransactionType.WITHDRAWAL,
+                Transaction.status == TransactionStatus.PENDING
+            )
+            .order_by(Transaction.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = result.all()
+        
+        if not claimed:
+            await self.session.rollback()
+            return [], []
+        
+        # Балансы блокируются до расчета: между проверкой и списанием их
+        # никто не изменит. Порядок по id исключает взаимные блокировки
+        result = await self.session.execute(
+            select(User.id, User.balance)
+            .where(User.id.in_({row[1] for row in claimed}))
+            .order_by(User.id)
+            .with_for_update()
+        )
+        balances: Dict[int, Decimal] = dict(result.all())
+        
+        totals: Dict[int, Decimal] = {}
+        completed = []
+        rejected = []
+        for row in claimed:
+            _, user_id, amount, _ = row
+            spent = totals.get(user_id, Decimal("0"))
+            if spent + amount <= balances.get(user_id, Decimal("0")):
+                totals[user_id] = spent + amount
+                completed.append(row)
+            else:
+                rejected.append(row)
+        
+        # Списание одним UPDATE ... FROM (VALUES ...)
+        if totals:
+            debits = values(
+                column("user_id", BigInteger),
+                column("amount", Numeric(10, 2)),
+                name="debits"
+            ).data(list(totals.items()))
+            
+            await self.session.execute(
+                update(User)
+                .where(User.id == debits.c.user_id)
+                .values(
+                    balance=User.balance - debits.c.amount,
+                    total_withdrawals=User.total_withdrawals + debits.c.amount
+                )
+                .execution_options(synchronize_session=False)
+            )
+        
+        now = datetime.utcnow()
+        
+        for rows, status in ((completed, TransactionStatus.COMPLETED), (rejected, TransactionStatus.FAILED)):
+            if rows:
+                await self.session.execute(
+                    update(Transaction)
+                    .where(Transaction.id.in_([row[0] for row in rows]))
+                    .values(status=status, processed_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+        
+        # Проводки пачками: описание заявки зависит только от комиссии
+        postings: Dict[str, List[Tuple[int, Decimal, int]]] = {}
+        for transaction_id, user_id, amount, description in completed:
+            postings.setdefault(description, []).append((user_id, -amount, transaction_id))
+        
+        for description, description_postings in postings.items():
+            await self.ledger.post_many(TransactionType.WITHDRAWAL, description_postings, description)
+        
+        await self._notify_withdrawals(completed, rejected)
+        
+        await self.session.commit()
+        await user_cache.invalidate_many(list(totals))
+        
+        return [row[0] for row in completed], [row[0] for row in rejected]
+    
+    async def _notify_withdrawals(self, completed: List[tuple], rejected: List[tuple]):
+        """Поставить в outbox уведомления о проведенных и отклоненных выводах"""
+        user_ids = {row[1] for row in completed} | {row[1] for row in rejected}
+        if not user_ids:
+            return
+        
+        result = await self.session.execute(
+            select(User.id, User.telegram_id).where(User.id.in_(user_ids))
+        )
+        telegram_ids = dict(result.all())
+        
+        payloads = [
+            {
+                "telegram_id": telegram_ids[user_id],
+                "text": f"✅ <b>Вывод проведен</b>\n\n🆔 Заявка: {transaction_id}\n💰 Сумма: {amount} ₽"
+            }
+            for transaction_id, user_id, amount, _ in completed
+        ] + [
+            {
+                "telegram_id": telegram_ids[user_id],
+                "text": (
+                    f"❌ <b>Вывод отклонен</b>\n\n🆔 Заявка: {transaction_id}\n"
+                    f"На балансе не хватает средств для вывода {amount} ₽."
+                )
+            }
+            for transaction_id, user_id, amount, _ in rejected
+        ]
+        await outbox.add_many(self.session, NOTIFY, payloads)
+    
     async def get_pending_withdrawals(self) -> list[Transaction]:
         """Получить ожидающие выводы"""
         result = await self.session.execute(
@@ -304,3 +758,26 @@ class PaymentService:
         except Exception:
             await self.session.rollback()
             return False
+
+
+async def run_withdrawal_payouts(batch_size: int, workers: int) -> Tuple[int, int]:
+    """
+    Провести все ожидающие выводы несколькими параллельными обработчиками
+    
+    Каждый обработчик забирает пачки в своей сессии, пока очередь не опустеет.
+    Возвращает число проведенных и отклоненных заявок.
+    """
+    async def worker() -> Tuple[int, int]:
+        completed = rejected = 0
+        while True:
+            async with db.async_session() as session:
+                batch_completed, batch_rejected = await PaymentService(session).process_withdrawal_batch(batch_size)
+            
+            if not batch_completed and not batch_rejected:
+                return completed, rejected
+            
+            completed += len(batch_completed)
+            rejected += len(batch_rejected)
+    
+    results = await asyncio.gather(*(worker() for _ in range(workers)))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
@@ -0,0 +1,53 @@
+"""
+Распределение призового фонда турнира
+"""
+import json
+from decimal import Decimal, ROUND_DOWN
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+CENT = Decimal("0.01")
+
+
+class PrizeDistribution:
+    """
+    Доли призового фонда по местам
+
+    Строка распределения хранится в турнире в виде JSON, где ключ - место
+    ("1") или диапазон мест ("4-10"). Доля диапазона делится поровну между
+    его местами.
+    """
+
+    def __init__(self, shares: Dict[int, Decimal]):
+        self.shares = shares
+
+    @classmethod
+    def parse(cls, raw: str) -> "PrizeDistribution":
+        """Разобрать JSON-строку распределения"""
+        shares = {}
+
+        for key, share in json.loads(raw or "{}").items():
+            if "-" in key:
+                start, end = map(int, key.split("-"))
+            else:
+                start = end = int(key)
+
+            positions = range(start, end + 1)
+            for position in positions:
+                shares[position] = Decimal(str(share)) / len(positions)
+
+        return cls(shares)
+
+    def payouts(self, prize_pool: Decimal) -> List[Tuple[int, Decimal]]:
+        """Суммы призов по местам: [(место, сумма)], округление вниз до копейки"""
+        return [
+            (position, (prize_pool * share).quantize(CENT, rounding=ROUND_DOWN))
+            for position, share in sorted(self.shares.items())
+            if share > 0
+        ]
+
+
+@lru_cache(maxsize=64)
+def compile_prize_distribution(raw: str) -> PrizeDistribution:
+    """Разобранное распределение (строк распределения немного, они кэшируются)"""
+    return PrizeDistribution.parse(raw)
@@ -0,0 +1,64 @@
+"""
+Расчет изменения рейтинга по итогам турнира
+
+Многопользовательский Эло: турнир считается набором попарных партий между
+всеми участниками. Игрок выигрывает у всех, кто занял место ниже, и делит
+очко с теми, кто занял то же место. Изменение рейтинга:
+
+    delta_i = K * (S_i - E_i) / (N - 1)
+
+где S_i - набранные очки, E_i - ожидаемые по формуле Эло. Попарные суммы
+считаются в NumPy блоками матрицы по уникальным значениям рейтинга, поэтому
+марафон на тысячи игроков не требует ни цикла по парам, ни матрицы N x N.
+"""
+from typing import Sequence
+
+import numpy as np
+
+# Строк матрицы попарных ожиданий в одном блоке
+BLOCK_SIZE = 1024
+
+
+def expected_scores(ratings: np.ndarray) -> np.ndarray:
+    """Ожидаемые очки каждого игрока против всех остальных"""
+    # Рейтинги целые, и различных значений намного меньше, чем игроков:
+    # считаем матрицу по уникальным рейтингам с весами-количествами
+    values, inverse, counts = np.unique(ratings, return_inverse=True, return_counts=True)
+    expected = np.empty(len(values))
+
+    for start in range(0, len(values), BLOCK_SIZE):
+        block = values[start:start + BLOCK_SIZE]
+        diff = (values[np.newaxis, :] - block[:, np.newaxis]) / 400.0
+        expected[start:start + len(block)] = (counts / (1.0 + np.power(10.0, diff))).sum(axis=1)
+
+    # Партия игрока с самим собой дает ровно 0.5
+    return expected[inverse] - 0.5
+
+
+def actual_scores(positions: np.ndarray) -> np.ndarray:
+    """Набранные очки: победа над каждым, кто ниже, и пол-очка за равное место"""
+    n = len(positions)
+    ordered = np.sort(positions)
+    left = np.searchsorted(ordered, positions, side="left")
+    right = np.searchsorted(ordered, positions, side="right")
+
+    below = n - right
+    ties = right - left - 1
+    return below + 0.5 * ties
+
+
+def rating_changes(
+    ratings: Sequence[float],
+    positions: Sequence[int],
+    k_factor: float
+) -> np.ndarray:
+    """Целые изменения рейтинга в порядке входных данных"""
+    ratings = np.asarray(ratings, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.int64)
+    n = len(ratings)
+
+    if n < 2:
+        return np.zeros(n, dtype=np.int64)
+
+    deltas = k_factor * (actual_scores(positions) - expected_scores(ratings)) / (n - 1)
+    return np.rint(deltas).astype(np.int64)
@@ -0,0 +1,203 @@
+"""
+Глобальный рейтинг игроков
+"""
+import asyncio
+import logging
+import uuid
+from typing import List, Optional, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import select
+
+from app.database.connection import db
+from app.database.models import User
+from app.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY = "rating:v1"
+# Копия, которая собирается при перестроении, флаг перестроения
+# и пользователи, измененные во время него
+STAGING_KEY = f"{KEY}:rebuild"
+REBUILD_FLAG_KEY = f"{KEY}:rebuilding"
+DIRTY_KEY = f"{KEY}:dirty"
+
+# Сколько пользователей читается из БД и пишется в Redis за раз при перестроении
+REBUILD_CHUNK_SIZE = 5000
+
+# Срок флага перестроения; продлевается с каждой пачкой. Если процесс упадет,
+# флаг истечет, и индекс перестроит другой процесс
+REBUILD_FLAG_TTL = 300
+
+# Точечное обновление: пары (id, рейтинг), пустой рейтинг - удаление из рейтинга.
+# Во время перестроения изменение пишется и в копию, а пользователь
+# помечается, чтобы перестроение не затерло его данными из БД
+UPDATE_SCRIPT = """
+local rebuilding = redis.call("EXISTS", KEYS[3]) == 1
+for i = 1, #ARGV, 2 do
+    local member, score = ARGV[i], ARGV[i + 1]
+    if score == "" then
+        redis.call("ZREM", KEYS[1], member)
+        if rebuilding then redis.call("ZREM", KEYS[2], member) end
+    else
+        redis.call("ZADD", KEYS[1], score, member)
+        if rebuilding then redis.call("ZADD", KEYS[2], score, member) end
+    end
+    if rebuilding then redis.call("SADD", KEYS[4], member) end
+end
+return 0
+"""
+
+# Пачка из БД в копию, кроме помеченных пользователей; 0, если флаг
+# перестроения уже не наш
+REBUILD_CHUNK_SCRIPT = """
+if redis.call("GET", KEYS[2]) ~= ARGV[1] then return 0 end
+redis.call("EXPIRE", KEYS[2], ARGV[2])
+for i = 3, #ARGV, 2 do
+    if redis.call("SISMEMBER", KEYS[3], ARGV[i]) == 0 then
+        redis.call("ZADD", KEYS[1], ARGV[i + 1], ARGV[i])
+    end
+end
+return 1
+"""
+
+# Подменить индекс копией и снять флаг перестроения
+REBUILD_FINISH_SCRIPT = """
+if redis.call("GET", KEYS[3]) ~= ARGV[1] then return 0 end
+if redis.call("EXISTS", KEYS[2]) == 1 then
+    redis.call("RENAME", KEYS[2], KEYS[1])
+else
+    redis.call("DEL", KEYS[1])
+end
+redis.call("DEL", KEYS[3], KEYS[4])
+return 1
+"""
+
+
+class RatingIndex:
+    """
+    Рейтинг незаблокированных пользователей в сортированном множестве Redis
+
+    Топ, место игрока и процентиль стоят O(log N). Индекс обновляется точечно
+    при изменении рейтинга или блокировке и периодически перестраивается
+    из таблицы users, чтобы исправить возможные расхождения. Обновления
+    во время перестроения не теряются: они пишутся и в собираемую копию.
+    """
+
+    def __init__(self):
+        self._update = redis_client.register_script(UPDATE_SCRIPT)
+        self._rebuild_chunk = redis_client.register_script(REBUILD_CHUNK_SCRIPT)
+        self._rebuild_finish = redis_client.register_script(REBUILD_FINISH_SCRIPT)
+
+    async def update(self, user_id: int, rating: int, is_banned: bool = False):
+        """Обновить рейтинг пользователя (заблокированные в рейтинг не входят)"""
+        await self.update_many([(user_id, rating, is_banned)])
+
+    async def update_many(self, rows: List[Tuple[int, int, bool]]):
+        """Обновить рейтинги пачкой: [(id, рейтинг, заблокирован)]"""
+        args = []
+        for user_id, rating, is_banned in rows:
+            args.extend((user_id, "" if is_banned else rating))
+
+        if not args:
+            return
+
+        try:
+            await self._update(keys=[KEY, STAGING_KEY, REBUILD_FLAG_KEY, DIRTY_KEY], args=args)
+        except RedisError as e:
+            logger.warning(f"Rating index update failed: {e}")
+
+    async def exists(self) -> bool:
+        """Построен ли индекс"""
+        return bool(await redis_client.exists(KEY))
+
+    async def top(self, limit: int = 10) -> Optional[List[Tuple[int, int]]]:
+        """Первые limit игроков: [(id, рейтинг)]; None, если индекс недоступен"""
+        try:
+            if not await redis_client.exists(KEY):
+                return None
+            rows = await redis_client.zrevrange(KEY, 0, limit - 1, withscores=True)
+        except RedisError as e:
+            logger.warning(f"Rating index read failed: {e}")
+            return None
+
+        return [(int(member), int(score)) for member, score in rows]
+
+    async def rank(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """Место игрока (с 1) и число игроков в рейтинге"""
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.zrevrank(KEY, str(user_id))
+                pipe.zcard(KEY)
+                rank, total = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Rating index read failed: {e}")
+            return None
+
+        if rank is None:
+            return None
+        return rank + 1, total
+
+    async def percentile(self, user_id: int) -> Optional[float]:
+        """Доля игроков (в процентах), у которых рейтинг не выше, чем у игрока"""
+        result = await self.rank(user_id)
+        if result is None:
+            return None
+
+        rank, total = result
+        return (total - rank + 1) / total * 100
+
+    async def rebuild(self) -> bool:
+        """
+        Перестроить индекс из таблицы users и атомарно подменить старый
+
+        Одновременно индекс перестраивает один процесс; False, если
+        перестроение уже идет в другом.
+        """
+        token = uuid.uuid4().hex
+        if not await redis_client.set(REBUILD_FLAG_KEY, token, nx=True, ex=REBUILD_FLAG_TTL):
+            return False
+
+        # Флаг ставится до чтения из БД: изменения, зафиксированные после
+        # начала чтения, уже пишутся и в копию
+        await redis_client.delete(STAGING_KEY, DIRTY_KEY)
+
+        async with db.async_session() as session:
+            result = await session.stream(
+                select(User.id, User.rating)
+                .where(User.is_banned == False)
+                .execution_options(yield_per=REBUILD_CHUNK_SIZE)
+            )
+
+            async for rows in result.partitions(REBUILD_CHUNK_SIZE):
+                args = [token, REBUILD_FLAG_TTL]
+                for user_id, rating in rows:
+                    args.extend((user_id, rating))
+
+                if not await self._rebuild_chunk(
+                    keys=[STAGING_KEY, REBUILD_FLAG_KEY, DIRTY_KEY], args=args
+                ):
+                    raise RuntimeError("Rating index rebuild flag expired")
+
+        if not await self._rebuild_finish(
+            keys=[KEY, STAGING_KEY, REBUILD_FLAG_KEY, DIRTY_KEY], args=[token]
+        ):
+            raise RuntimeError("Rating index rebuild flag expired")
+        return True
+
+
+async def run_rating_index_worker(interval: int):
+    """Построить индекс при старте, если его нет, и затем перестраивать периодически"""
+    rebuild = False
+    while True:
+        try:
+            if rebuild or not await rating_index.exists():
+                await rating_index.rebuild()
+        except Exception as e:
+            logger.error(f"Rating index rebuild failed: {e}")
+
+        rebuild = True
+        await asyncio.sleep(interval)
+
+
+# Глобальный экземпляр индекса рейтинга
+rating_index = RatingIndex()
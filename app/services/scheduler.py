@@ -0,0 +1,114 @@
+"""
+Планировщик сроков турниров
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from redis.exceptions import RedisError
+
+from app.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY = "scheduler:v1"
+
+# Сколько наступивших событий забирается за одно обращение к Redis
+DUE_BATCH_SIZE = 100
+
+# Максимальный сон: события, запланированные другими процессами, будят
+# планировщик не позже этого срока
+MAX_SLEEP = 30.0
+
+
+class DeadlineScheduler:
+    """
+    Очередь сроков в сортированном множестве Redis (куча по времени)
+
+    Элемент - "событие:id турнира", вес - время наступления. Ближайший срок
+    читается за O(log N), поэтому процесс спит ровно до него и не опрашивает
+    таблицу турниров. Событие забирается ZREM: из нескольких процессов его
+    обработает только один.
+    """
+
+    def __init__(self):
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _event(self) -> asyncio.Event:
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    async def schedule(self, event: str, tournament_id: int, due_at: datetime):
+        """Запланировать событие турнира (повторный вызов переносит срок)"""
+        await self.schedule_many([(event, tournament_id, due_at)])
+
+    async def schedule_many(self, events: Iterable[Tuple[str, int, datetime]]):
+        """Запланировать пачку событий одним обращением"""
+        mapping = {
+            f"{event}:{tournament_id}": _timestamp(due_at)
+            for event, tournament_id, due_at in events
+        }
+        if not mapping:
+            return
+
+        try:
+            await redis_client.zadd(KEY, mapping)
+        except RedisError as e:
+            logger.error(f"Failed to schedule tournament events: {e}")
+            return
+
+        # Новое событие может оказаться раньше того, до которого спит планировщик
+        self._event().set()
+
+    async def cancel(self, event: str, tournament_id: int):
+        """Отменить событие"""
+        await self.cancel_many([(event, tournament_id)])
+
+    async def cancel_many(self, events: Iterable[Tuple[str, int]]):
+        """Отменить пачку событий одним обращением"""
+        members = [f"{event}:{tournament_id}" for event, tournament_id in events]
+        if not members:
+            return
+
+        try:
+            await redis_client.zrem(KEY, *members)
+        except RedisError as e:
+            logger.warning(f"Failed to cancel tournament events: {e}")
+
+    async def wait_due(self) -> List[Tuple[str, int]]:
+        """Дождаться ближайшего срока и забрать наступившие события"""
+        wakeup = self._event()
+
+        while True:
+            wakeup.clear()
+            now = time.time()
+
+            due = await redis_client.zrangebyscore(KEY, "-inf", now, start=0, num=DUE_BATCH_SIZE)
+            if due:
+                claimed = []
+                for member in due:
+                    if await redis_client.zrem(KEY, member):
+                        event, tournament_id = member.decode().rsplit(":", 1)
+                        claimed.append((event, int(tournament_id)))
+                if claimed:
+                    return claimed
+                continue
+
+            nearest = await redis_client.zrange(KEY, 0, 0, withscores=True)
+            delay = nearest[0][1] - now if nearest else MAX_SLEEP
+
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=min(delay, MAX_SLEEP))
+            except asyncio.TimeoutError:
+                pass
+
+
+def _timestamp(value: datetime) -> float:
+    """Время в UTC (как в моделях) в секундах Unix"""
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+# Глобальный экземпляр планировщика
+scheduler = DeadlineScheduler()
@@ -2,18 +2,89 @@
 Сервис для работы с турнирами
 """
 import asyncio
+import json
+import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+from aiogram import Bot
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, func, values, column, BigInteger, Integer
+from sqlalchemy.dialects.postgresql import insert
 
+from app.config import settings
+from app.database.connection import db
 from app.database.models import (
-    Tournament, Participant, User, TournamentType, 
+    Tournament, Participant, User, GameSession, TournamentType, 
     TournamentStatus, GameType, Transaction, TransactionType
 )
+from app.services.leaderboard import leaderboard
+from app.services.outbox import NOTIFY, outbox
 from app.services.payment_service import PaymentService
+from app.services.prize_distribution import compile_prize_distribution
+from app.services.rating_engine import rating_changes
+from app.services.rating_index import rating_index
+from app.services.scheduler import scheduler
+from app.services.user_cache import user_cache
 from app.services.user_service import UserService
+from app.services.validation_service import ValidationService
+from app.utils.pagination import Page, paginate
+
+logger = logging.getLogger(__name__)
+
+# События планировщика
+CLOSE_REGISTRATION = "close_registration"
+FINISH = "finish"
+
+# Сообщение outbox: завершить турнир, когда прислан последний результат
+COMPLETE_TOURNAMENT = "complete_tournament"
+
+# Статусы, из которых турнир можно отменить
+CANCELLABLE_STATUSES = (
+    TournamentStatus.CREATED,
+    TournamentStatus.REGISTRATION,
+    TournamentStatus.IN_PROGRESS
+)
+
+# Сколько турниров читается за раз при заполнении планировщика
+SCHEDULE_CHUNK_SIZE = 1000
+
+
+def tournament_timeout(tournament_type: TournamentType) -> timedelta:
+    """Длительность турнира"""
+    if tournament_type == TournamentType.DUEL:
+        return timedelta(seconds=settings.DUEL_TIMEOUT)
+    elif tournament_type == TournamentType.GROUP:
+        return timedelta(seconds=settings.GROUP_TOURNAMENT_TIMEOUT)
+    else:  # MARATHON
+        return timedelta(seconds=settings.MARATHON_TIMEOUT)
+
+
+def format_tournament_result(title: str, position: Optional[int], winnings) -> str:
+    """Сообщение участнику об итогах турнира"""
+    if position is None:
+        return (
+            f"🏁 <b>Турнир «{title}» завершен!</b>\n\n"
+            f"Вы не прислали результат, место не присвоено."
+        )
+    
+    text = (
+        f"🏁 <b>Турнир «{title}» завершен!</b>\n\n"
+        f"🏅 <b>Ваше место:</b> {position}"
+    )
+    if winnings:
+        text += f"\n💰 <b>Выигрыш:</b> {winnings} ₽"
+    return text
+
+
+def format_duel_found(tournament_id: int, game_type: GameType, entry_fee, opponent_rating: int) -> str:
+    """Сообщение игроку о найденном сопернике"""
+    return (
+        f"⚔️ <b>Соперник найден!</b>\n\n"
+        f"🆔 <b>Дуэль:</b> #{tournament_id}\n"
+        f"🎮 <b>Игра:</b> {game_type.value}\n"
+        f"💰 <b>Взнос:</b> {entry_fee} ₽\n"
+        f"🏅 <b>Рейтинг соперника:</b> {opponent_rating}"
+    )
 
 
 class TournamentService:
@@ -21,6 +92,7 @@ class TournamentService:
         self.session = session
         self.payment_service = PaymentService(session)
         self.user_service = UserService(session)
+        self.validation_service = ValidationService(session)
     
     async def create_tournament(
         self,
@@ -34,126 +106,263 @@ class TournamentService:
         min_participants: int = 2
     ) -> Tournament:
         """Создать новый турнир"""
-        # Рассчитываем комиссию платформы
-        commission_rate = await self._get_commission_rate(entry_fee)
-        platform_commission = entry_fee * commission_rate
+        tournament = await self._new_tournament(
+            creator_id, title, description, game_type, tournament_type,
+            entry_fee, max_participants, min_participants
+        )
         
-        # Рассчитываем призовой фонд
-        prize_pool = entry_fee * max_participants * (1 - commission_rate)
+        # Регистрация открывается сразу и закрывается по сроку
+        tournament.status = TournamentStatus.REGISTRATION
+        tournament.registration_ends_at = datetime.utcnow() + timedelta(
+            seconds=settings.REGISTRATION_TIMEOUT
+        )
         
-        # Определяем распределение призов
-        prize_distribution = self._get_prize_distribution(tournament_type)
+        self.session.add(tournament)
+        await self.session.commit()
+        await self.session.refresh(tournament)
         
-        tournament = Tournament(
-            creator_id=creator_id,
-            title=title,
-            description=description,
+        await scheduler.schedule(CLOSE_REGISTRATION, tournament.id, tournament.registration_ends_at)
+        
+        return tournament
+    
+    async def create_duel(
+        self,
+        user_ids: Tuple[int, int],
+        game_type: GameType,
+        entry_fee: float
+    ) -> Tuple[Optional[Tournament], Optional[int]]:
+        """
+        Создать начатую дуэль для пары игроков из очереди подбора
+        
+        Турнир, оба участника, оба взноса и уведомления игрокам записываются
+        одной транзакцией. Возвращает (турнир, None) или (None, id игрока,
+        у которого не хватило средств).
+        """
+        tournament = await self._new_tournament(
+            creator_id=user_ids[0],
+            title=f"Дуэль: {game_type.value}",
+            description=None,
             game_type=game_type,
-            tournament_type=tournament_type,
+            tournament_type=TournamentType.DUEL,
             entry_fee=entry_fee,
-            prize_pool=prize_pool,
-            platform_commission=platform_commission,
-            max_participants=max_participants,
-            min_participants=min_participants,
-            prize_distribution=prize_distribution,
-            status=TournamentStatus.CREATED
+            max_participants=2
         )
+        tournament.status = TournamentStatus.IN_PROGRESS
+        tournament.participant_count = 2
+        tournament.started_at = datetime.utcnow()
         
         self.session.add(tournament)
+        await self.session.flush()
+        
+        self.session.add_all([
+            Participant(user_id=user_id, tournament_id=tournament.id)
+            for user_id in user_ids
+        ])
+        
+        for user_id in user_ids:
+            if not await self.payment_service.charge_entry_fee(user_id, tournament.id, entry_fee):
+                await self.session.rollback()
+                return None, user_id
+        
+        result = await self.session.execute(
+            select(User.id, User.telegram_id, User.rating).where(User.id.in_(user_ids))
+        )
+        users = {user_id: (telegram_id, rating) for user_id, telegram_id, rating in result.all()}
+        first, second = user_ids
+        await outbox.add_many(self.session, NOTIFY, [
+            {
+                "telegram_id": users[user_id][0],
+                "text": format_duel_found(tournament.id, game_type, entry_fee, users[opponent_id][1])
+            }
+            for user_id, opponent_id in ((first, second), (second, first))
+        ])
+        
         await self.session.commit()
-        await self.session.refresh(tournament)
+        await user_cache.invalidate_many(list(user_ids))
         
-        return tournament
+        await scheduler.schedule(
+            FINISH, tournament.id,
+            tournament.started_at + tournament_timeout(TournamentType.DUEL)
+        )
+        
+        return tournament, None
     
     async def join_tournament(self, tournament_id: int, user_id: int) -> bool:
         """Участвовать в турнире"""
-        # Получаем турнир
+        # Занимаем место условным инкрементом: проверка статуса и свободных мест
+        # выполняется в том же UPDATE, без загрузки списка участников
         result = await self.session.execute(
-            select(Tournament)
-            .where(Tournament.id == tournament_id)
-            .options(selectinload(Tournament.participants))
+            update(Tournament)
+            .where(
+                Tournament.id == tournament_id,
+                Tournament.status == TournamentStatus.REGISTRATION,
+                Tournament.participant_count < Tournament.max_participants
+            )
+            .values(participant_count=Tournament.participant_count + 1)
+            .returning(
+                Tournament.participant_count,
+                Tournament.min_participants,
+                Tournament.entry_fee
+            )
         )
-        tournament = result.scalar_one_or_none()
+        seat = result.one_or_none()
         
-        if not tournament:
+        if not seat:
+            await self.session.rollback()
             return False
         
-        # Проверяем статус турнира
-        if tournament.status != TournamentStatus.REGISTRATION:
-            return False
+        participant_count, min_participants, entry_fee = seat
         
-        # Проверяем количество участников
-        if len(tournament.participants) >= tournament.max_participants:
-            return False
-        
-        # Проверяем, не участвует ли уже пользователь
-        existing_participant = await self.session.execute(
-            select(Participant)
-            .where(
-                Participant.tournament_id == tournament_id,
-                Participant.user_id == user_id
+        # Повторная регистрация упирается в уникальный индекс (tournament_id, user_id)
+        result = await self.session.execute(
+            insert(Participant)
+            .values(
+                user_id=user_id,
+                tournament_id=tournament_id,
+                winnings=0,
+                is_active=True,
+                joined_at=datetime.utcnow()
             )
+            .on_conflict_do_nothing(index_elements=["tournament_id", "user_id"])
+            .returning(Participant.id)
         )
-        if existing_participant.scalar_one_or_none():
+        if result.scalar_one_or_none() is None:
+            await self.session.rollback()
             return False
         
-        # Обрабатываем платеж
+        # Платеж фиксирует место и участника вместе со списанием,
+        # а при ошибке откатывает их
         payment_success = await self.payment_service.process_tournament_payment(
             user_id=user_id,
             tournament_id=tournament_id,
-            entry_fee=tournament.entry_fee
+            entry_fee=entry_fee
         )
         
         if not payment_success:
             return False
         
-        # Добавляем участника
-        participant = Participant(
-            user_id=user_id,
-            tournament_id=tournament_id
-        )
-        
-        self.session.add(participant)
-        await self.session.commit()
-        
-        # Проверяем, можно ли начать турнир
-        await self._check_tournament_ready(tournament_id)
+        # Если набралось достаточно участников, начинаем турнир
+        if participant_count >= min_participants:
+            await self.start_tournament(tournament_id)
         
         return True
     
     async def start_tournament(self, tournament_id: int) -> bool:
         """Начать турнир"""
+        # Переход статуса условный: турнир стартует один раз, даже если
+        # несколько регистраций одновременно набрали минимум участников
         result = await self.session.execute(
-            select(Tournament)
-            .where(Tournament.id == tournament_id)
-            .options(selectinload(Tournament.participants))
-        )
-        tournament = result.scalar_one_or_none()
-        
-        if not tournament:
-            return False
-        
-        # Проверяем минимальное количество участников
-        if len(tournament.participants) < tournament.min_participants:
-            return False
-        
-        # Обновляем статус турнира
-        await self.session.execute(
             update(Tournament)
-            .where(Tournament.id == tournament_id)
+            .where(
+                Tournament.id == tournament_id,
+                Tournament.status == TournamentStatus.REGISTRATION,
+                Tournament.participant_count >= Tournament.min_participants
+            )
             .values(
                 status=TournamentStatus.IN_PROGRESS,
                 started_at=datetime.utcnow()
             )
+            .returning(Tournament.tournament_type, Tournament.started_at)
         )
+        started = result.one_or_none()
         
         await self.session.commit()
         
+        if not started:
+            return False
+        
+        tournament_type, started_at = started
+        await scheduler.cancel(CLOSE_REGISTRATION, tournament_id)
+        await scheduler.schedule(FINISH, tournament_id, started_at + tournament_timeout(tournament_type))
+        
         # Запускаем турнир
         await self._run_tournament(tournament_id)
         
         return True
     
+    async def close_registration(self, tournament_id: int) -> bool:
+        """Срок регистрации истек: начать турнир или отменить недобранный"""
+        if await self.start_tournament(tournament_id):
+            return True
+        
+        return await self.cancel_tournament(
+            tournament_id, statuses=(TournamentStatus.REGISTRATION,)
+        )
+    
+    async def cancel_tournament(
+        self,
+        tournament_id: int,
+        statuses: Tuple[TournamentStatus, ...] = CANCELLABLE_STATUSES
+    ) -> bool:
+        """Отменить турнир и вернуть взносы участникам"""
+        cancelled = await self._cancel_tournaments(
+            Tournament.status.in_(statuses),
+            Tournament.id == tournament_id
+        )
+        return bool(cancelled)
+    
+    async def cancel_game_tournaments(self, game_type: GameType) -> List[int]:
+        """
+        Отменить все незавершенные турниры по игре (например, при сбое игры)
+        
+        Возвращает id отмененных турниров.
+        """
+        return await self._cancel_tournaments(
+            Tournament.status.in_(CANCELLABLE_STATUSES),
+            Tournament.game_type == game_type
+        )
+    
+    async def _cancel_tournaments(self, *conditions) -> List[int]:
+        """
+        Отменить турниры по условию и вернуть взносы в одной транзакции
+        
+        Переход статуса условный, а возвраты идемпотентны, поэтому повтор
+        после сбоя ничего не начисляет дважды.
+        """
+        result = await self.session.execute(
+            update(Tournament)
+            .where(*conditions)
+            .values(
+                status=TournamentStatus.CANCELLED,
+                ended_at=datetime.utcnow()
+            )
+            .returning(Tournament.id)
+            .execution_options(synchronize_session=False)
+        )
+        tournament_ids = result.scalars().all()
+        
+        if not tournament_ids:
+            await self.session.rollback()
+            return []
+        
+        user_ids = await self.payment_service.refund_entry_fees(tournament_ids)
+        
+        result = await self.session.execute(
+            select(User.telegram_id).where(User.id.in_(user_ids))
+        )
+        await outbox.add_many(self.session, NOTIFY, [
+            {
+                "telegram_id": telegram_id,
+                "text": "↩️ <b>Турнир отменен</b>\n\nВзнос возвращен на ваш баланс."
+            }
+            for telegram_id in result.scalars()
+        ])
+        
+        await self.session.commit()
+        
+        await user_cache.invalidate_many(user_ids)
+        await scheduler.cancel_many(
+            (event, tournament_id)
+            for tournament_id in tournament_ids
+            for event in (CLOSE_REGISTRATION, FINISH)
+        )
+        
+        return tournament_ids
+    
+    async def finish_tournament(self, tournament_id: int):
+        """Завершить турнир с присланными результатами (по сроку или когда прислали все)"""
+        await self._complete_tournament(tournament_id)
+    
     async def submit_game_result(
         self,
         tournament_id: int,
@@ -161,34 +370,120 @@ class TournamentService:
         score: float,
         game_data: Dict[str, Any]
     ) -> bool:
-        """Отправить результат игры"""
-        # Находим участника
+        """
+        Отправить результат игры; False, если турнир не идет или участника нет
+        
+        Каждая партия сохраняется в game_sessions с данными для проверки
+        при завершении турнира: для 2048 - seed и ходы. Время партии
+        считается по серверным меткам: start_time из game_data (выдан
+        при старте игры) и моменту отправки.
+        """
+        # Результаты принимаются только в идущем турнире. Строка турнира
+        # блокируется до фиксации: завершение не расставит места, пока
+        # результат записывается
         result = await self.session.execute(
-            select(Participant)
+            select(Tournament.tournament_type, Tournament.game_type)
             .where(
-                Participant.tournament_id == tournament_id,
-                Participant.user_id == user_id
+                Tournament.id == tournament_id,
+                Tournament.status == TournamentStatus.IN_PROGRESS
             )
+            .with_for_update(key_share=True)
         )
-        participant = result.scalar_one_or_none()
+        row = result.one_or_none()
         
-        if not participant:
+        if row is None:
+            await self.session.rollback()
             return False
         
-        # Обновляем результат
-        await self.session.execute(
+        tournament_type, game_type = row
+        
+        best_only = tournament_type == TournamentType.MARATHON
+        
+        # Первый результат участника увеличивает счетчик присланных результатов
+        result = await self.session.execute(
             update(Participant)
-            .where(Participant.id == participant.id)
+            .where(
+                Participant.tournament_id == tournament_id,
+                Participant.user_id == user_id,
+                Participant.score.is_(None)
+            )
             .values(score=score)
+            .returning(Participant.id)
+        )
+        
+        if result.scalar_one_or_none() is None:
+            # Повторная отправка обновляет результат; в марафоне засчитывается лучший
+            result = await self.session.execute(
+                update(Participant)
+                .where(
+                    Participant.tournament_id == tournament_id,
+                    Participant.user_id == user_id
+                )
+                .values(
+                    score=func.greatest(Participant.score, score) if best_only else score
+                )
+                .returning(Participant.score)
+                .execution_options(synchronize_session=False)
+            )
+            stored_score = result.scalar_one_or_none()
+            
+            if stored_score is None:
+                await self.session.rollback()
+                return False
+            
+            self._record_game_session(tournament_id, user_id, game_type, score, game_data)
+            await self.session.commit()
+            
+            await leaderboard.submit(
+                tournament_id, user_id, float(stored_score),
+                best_only=best_only
+            )
+            return True
+        
+        result = await self.session.execute(
+            update(Tournament)
+            .where(Tournament.id == tournament_id)
+            .values(results_count=Tournament.results_count + 1)
+            .returning(Tournament.results_count, Tournament.participant_count)
         )
+        results_count, participant_count = result.one()
         
+        # Счетчик растет атомарно, поэтому равенство наступает ровно у одной
+        # отправки. Завершение с выплатами выполняет диспетчер outbox, а не
+        # запрос последнего игрока
+        if results_count == participant_count:
+            outbox.add(self.session, COMPLETE_TOURNAMENT, {"tournament_id": tournament_id})
+        
+        self._record_game_session(tournament_id, user_id, game_type, score, game_data)
         await self.session.commit()
         
-        # Проверяем, завершен ли турнир
-        await self._check_tournament_completion(tournament_id)
+        await leaderboard.submit(tournament_id, user_id, float(score), best_only=best_only)
         
         return True
     
+    def _record_game_session(
+        self,
+        tournament_id: int,
+        user_id: int,
+        game_type: GameType,
+        score: float,
+        game_data: Dict[str, Any]
+    ):
+        """Сохранить партию для проверки при завершении турнира"""
+        now = datetime.utcnow()
+        start_time = game_data.get("start_time")
+        
+        self.session.add(GameSession(
+            tournament_id=tournament_id,
+            user_id=user_id,
+            game_type=game_type,
+            game_data=json.dumps(game_data),
+            score=score,
+            is_completed=True,
+            started_at=datetime.utcfromtimestamp(start_time) if start_time else now,
+            completed_at=now
+        ))
+    
     async def get_active_tournaments(self, game_type: Optional[GameType] = None) -> List[Tournament]:
         """Получить активные турниры"""
         query = select(Tournament).where(
@@ -204,14 +499,37 @@ class TournamentService:
         result = await self.session.execute(query)
         return result.scalars().all()
     
-    async def get_tournament_by_id(self, tournament_id: int) -> Optional[Tournament]:
-        """Получить турнир по ID"""
-        result = await self.session.execute(
+    async def get_active_tournaments_page(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 10,
+        game_type: Optional[GameType] = None
+    ) -> Page:
+        """Получить страницу активных турниров (от новых к старым)"""
+        query = (
             select(Tournament)
-            .where(Tournament.id == tournament_id)
-            .options(selectinload(Tournament.participants))
+            .where(
+                Tournament.status.in_([
+                    TournamentStatus.REGISTRATION,
+                    TournamentStatus.IN_PROGRESS
+                ])
+            )
         )
-        return result.scalar_one_or_none()
+        
+        if game_type:
+            query = query.where(Tournament.game_type == game_type)
+        
+        return await paginate(
+            self.session,
+            query,
+            [Tournament.created_at, Tournament.id],
+            cursor=cursor,
+            limit=limit
+        )
+    
+    async def get_tournament_by_id(self, tournament_id: int) -> Optional[Tournament]:
+        """Получить турнир по ID"""
+        return await self.session.get(Tournament, tournament_id)
     
     async def get_user_tournaments(self, user_id: int, limit: int = 20) -> List[Tournament]:
         """Получить турниры пользователя"""
@@ -224,6 +542,43 @@ class TournamentService:
         )
         return result.scalars().all()
     
+    async def _new_tournament(
+        self,
+        creator_id: int,
+        title: str,
+        description: Optional[str],
+        game_type: GameType,
+        tournament_type: TournamentType,
+        entry_fee: float,
+        max_participants: int,
+        min_participants: int = 2
+    ) -> Tournament:
+        """Собрать турнир с рассчитанными комиссией и призовым фондом"""
+        # Рассчитываем комиссию платформы
+        commission_rate = await self._get_commission_rate(entry_fee)
+        platform_commission = entry_fee * commission_rate
+        
+        # Рассчитываем призовой фонд
+        prize_pool = entry_fee * max_participants * (1 - commission_rate)
+        
+        # Определяем распределение призов
+        prize_distribution = self._get_prize_distribution(tournament_type)
+        
+        return Tournament(
+            creator_id=creator_id,
+            title=title,
+            description=description,
+            game_type=game_type,
+            tournament_type=tournament_type,
+            entry_fee=entry_fee,
+            prize_pool=prize_pool,
+            platform_commission=platform_commission,
+            max_participants=max_participants,
+            min_participants=min_participants,
+            prize_distribution=prize_distribution,
+            status=TournamentStatus.CREATED
+        )
+    
     async def _get_commission_rate(self, entry_fee: float) -> float:
         """Получить ставку комиссии"""
         if entry_fee < 500:
@@ -242,17 +597,6 @@ class TournamentService:
         else:  # MARATHON
             return '{"1": 0.4, "2": 0.25, "3": 0.15, "4-10": 0.2}'  # 40%, 25%, 15%, 20%
     
-    async def _check_tournament_ready(self, tournament_id: int):
-        """Проверить, готов ли турнир к запуску"""
-        tournament = await self.get_tournament_by_id(tournament_id)
-        
-        if not tournament:
-            return
-        
-        # Если набралось достаточно участников, начинаем турнир
-        if len(tournament.participants) >= tournament.min_participants:
-            await self.start_tournament(tournament_id)
-    
     async def _run_tournament(self, tournament_id: int):
         """Запустить турнир"""
         tournament = await self.get_tournament_by_id(tournament_id)
@@ -269,9 +613,7 @@ class TournamentService:
     
     async def _run_duel_tournament(self, tournament: Tournament):
         """Запустить дуэльный турнир"""
-        participants = tournament.participants
-        
-        if len(participants) != 2:
+        if tournament.participant_count != 2:
             return
         
         # Для дуэли просто ждем результатов от обоих участников
@@ -286,93 +628,207 @@ class TournamentService:
     
     async def _run_marathon_tournament(self, tournament: Tournament):
         """Запустить марафонский турнир"""
-        # Марафонский турнир длится 24 часа
-        # Участники могут играть несколько раз, засчитывается лучший результат
+        # Марафонский турнир длится MARATHON_TIMEOUT: по сроку планировщик
+        # завершает его с лучшими результатами участников (см. submit_game_result)
         pass
     
-    async def _check_tournament_completion(self, tournament_id: int):
-        """Проверить завершение турнира"""
-        tournament = await self.get_tournament_by_id(tournament_id)
+    async def _complete_tournament(self, tournament_id: int):
+        """Завершить турнир и распределить призы"""
+        # Переход статуса условный, поэтому проверка игр и выплаты
+        # выполняются один раз
+        result = await self.session.execute(
+            update(Tournament)
+            .where(
+                Tournament.id == tournament_id,
+                Tournament.status == TournamentStatus.IN_PROGRESS
+            )
+            .values(
+                status=TournamentStatus.COMPLETED,
+                ended_at=datetime.utcnow()
+            )
+            .returning(Tournament.title, Tournament.prize_pool, Tournament.prize_distribution)
+        )
+        row = result.one_or_none()
         
-        if not tournament:
+        if not row:
+            await self.session.rollback()
             return
         
-        # Проверяем, все ли участники отправили результаты
-        participants_with_scores = await self.session.execute(
-            select(Participant)
+        title, prize_pool, raw_distribution = row
+        
+        # Перед расстановкой мест перепроверяем игры турнира
+        await self.validation_service.validate_tournament_sessions(tournament_id)
+        
+        # Места участников одним UPDATE по оконной функции. Не приславшие
+        # результат места, призов и изменения рейтинга не получают
+        ranked = (
+            select(
+                Participant.id,
+                func.row_number().over(
+                    order_by=(
+                        Participant.score.desc(),
+                        Participant.joined_at,
+                        Participant.id
+                    )
+                ).label("position")
+            )
             .where(
                 Participant.tournament_id == tournament_id,
-                Participant.score.isnot(None)
+                Participant.score.is_not(None)
             )
+            .subquery()
+        )
+        await self.session.execute(
+            update(Participant)
+            .where(Participant.id == ranked.c.id)
+            .values(final_position=ranked.c.position)
+            .execution_options(synchronize_session=False)
         )
         
-        participants_with_scores = participants_with_scores.scalars().all()
-        
-        if len(participants_with_scores) == len(tournament.participants):
-            await self._complete_tournament(tournament_id)
-    
-    async def _complete_tournament(self, tournament_id: int):
-        """Завершить турнир и распределить призы"""
-        tournament = await self.get_tournament_by_id(tournament_id)
+        # Выплачиваем призы
+        distribution = compile_prize_distribution(raw_distribution)
+        await self.payment_service.pay_tournament_prizes(
+            tournament_id, distribution.payouts(prize_pool)
+        )
         
-        if not tournament:
-            return
+        # Пересчитываем рейтинги участников
+        ratings = await self._apply_rating_changes(tournament_id)
         
-        # Получаем участников с результатами
-        participants = await self.session.execute(
-            select(Participant)
+        # Итоги участникам уйдут после фиксации вместе с выплатами
+        result = await self.session.execute(
+            select(User.telegram_id, Participant.final_position, Participant.winnings)
+            .join(User, User.id == Participant.user_id)
             .where(Participant.tournament_id == tournament_id)
-            .order_by(Participant.score.desc())
         )
-        participants = participants.scalars().all()
+        await outbox.add_many(self.session, NOTIFY, [
+            {
+                "telegram_id": telegram_id,
+                "text": format_tournament_result(title, position, winnings)
+            }
+            for telegram_id, position, winnings in result.all()
+        ])
         
-        # Определяем победителей
-        import json
-        prize_distribution = json.loads(tournament.prize_distribution)
+        await self.session.commit()
         
-        for i, participant in enumerate(participants):
-            position = i + 1
-            
-            # Определяем размер приза
-            prize_percentage = 0
-            for pos_range, percentage in prize_distribution.items():
-                if pos_range == str(position):
-                    prize_percentage = percentage
-                    break
-                elif "-" in pos_range:
-                    start, end = map(int, pos_range.split("-"))
-                    if start <= position <= end:
-                        prize_percentage = percentage
-                        break
-            
-            if prize_percentage > 0:
-                prize_amount = tournament.prize_pool * prize_percentage
-                
-                # Обновляем позицию и выигрыш
-                await self.session.execute(
-                    update(Participant)
-                    .where(Participant.id == participant.id)
-                    .values(
-                        final_position=position,
-                        winnings=prize_amount
-                    )
-                )
-                
-                # Выплачиваем приз
-                await self.payment_service.process_prize_payment(
-                    user_id=participant.user_id,
-                    tournament_id=tournament_id,
-                    prize_amount=prize_amount
-                )
+        await user_cache.invalidate_many([user_id for user_id, _, _ in ratings])
+        await rating_index.update_many(ratings)
+        await scheduler.cancel(FINISH, tournament_id)
+    
+    async def _apply_rating_changes(self, tournament_id: int) -> List[Tuple[int, int, bool]]:
+        """
+        Изменить рейтинги и статистику участников по занятым местам
         
-        # Обновляем статус турнира
-        await self.session.execute(
-            update(Tournament)
-            .where(Tournament.id == tournament_id)
+        Изменения считаются векторно для всех участников с местом сразу и
+        записываются одним UPDATE. Возвращает (id, новый рейтинг, заблокирован).
+        """
+        result = await self.session.execute(
+            select(Participant.user_id, Participant.final_position, User.rating)
+            .join(User, User.id == Participant.user_id)
+            .where(
+                Participant.tournament_id == tournament_id,
+                Participant.final_position.is_not(None)
+            )
+        )
+        rows = result.all()
+        
+        if not rows:
+            return []
+        
+        user_ids, positions, current = zip(*rows)
+        deltas = rating_changes(current, positions, settings.RATING_K_FACTOR)
+        
+        changes = values(
+            column("user_id", BigInteger),
+            column("delta", Integer),
+            column("won", Integer),
+            name="changes"
+        ).data([
+            (user_id, int(delta), int(position == 1))
+            for user_id, position, delta in zip(user_ids, positions, deltas)
+        ])
+        
+        result = await self.session.execute(
+            update(User)
+            .where(User.id == changes.c.user_id)
             .values(
-                status=TournamentStatus.COMPLETED,
-                ended_at=datetime.utcnow()
+                rating=User.rating + changes.c.delta,
+                tournaments_played=User.tournaments_played + 1,
+                tournaments_won=User.tournaments_won + changes.c.won
+            )
+            .returning(User.id, User.rating, User.is_banned)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
+
+
+async def schedule_pending_deadlines():
+    """
+    Записать в планировщик сроки всех открытых турниров
+    
+    Выполняется при старте: восстанавливает очередь сроков, если Redis
+    потерял данные. Повторная запись события только подтверждает его срок.
+    """
+    async with db.async_session() as session:
+        result = await session.stream(
+            select(
+                Tournament.id,
+                Tournament.status,
+                Tournament.tournament_type,
+                Tournament.registration_ends_at,
+                Tournament.started_at
+            )
+            .where(
+                Tournament.status.in_([
+                    TournamentStatus.REGISTRATION,
+                    TournamentStatus.IN_PROGRESS
+                ])
             )
+            .execution_options(yield_per=SCHEDULE_CHUNK_SIZE)
         )
         
-        await self.session.commit()
+        async for rows in result.partitions(SCHEDULE_CHUNK_SIZE):
+            events = []
+            for tournament_id, status, tournament_type, registration_ends_at, started_at in rows:
+                if status == TournamentStatus.REGISTRATION and registration_ends_at:
+                    events.append((CLOSE_REGISTRATION, tournament_id, registration_ends_at))
+                elif status == TournamentStatus.IN_PROGRESS and started_at:
+                    events.append((FINISH, tournament_id, started_at + tournament_timeout(tournament_type)))
+            await scheduler.schedule_many(events)
+
+
+async def run_deadline_worker():
+    """Обрабатывать сроки турниров по мере наступления"""
+    try:
+        await schedule_pending_deadlines()
+    except Exception as e:
+        logger.error(f"Failed to restore tournament deadlines: {e}")
+    
+    while True:
+        try:
+            due = await scheduler.wait_due()
+        except Exception as e:
+            logger.error(f"Tournament scheduler failed: {e}")
+            await asyncio.sleep(5)
+            continue
+        
+        for event, tournament_id in due:
+            try:
+                async with db.async_session() as session:
+                    tournament_service = TournamentService(session)
+                    if event == CLOSE_REGISTRATION:
+                        await tournament_service.close_registration(tournament_id)
+                    elif event == FINISH:
+                        await tournament_service.finish_tournament(tournament_id)
+            except Exception as e:
+                logger.error(f"Tournament {tournament_id} {event} failed: {e}")
+                # Повторяем позже, переходы статусов условные и повтор безопасен
+                await scheduler.schedule(
+                    event, tournament_id, datetime.utcnow() + timedelta(minutes=1)
+                )
+
+
+@outbox.handler(COMPLETE_TOURNAMENT)
+async def complete_tournament(bot: Bot, payload: Dict[str, Any]):
+    """Завершить турнир, в котором все участники прислали результаты"""
+    async with db.async_session() as session:
+        await TournamentService(session).finish_tournament(payload["tournament_id"])
@@ -0,0 +1,156 @@
+"""
+Кэш пользователей
+"""
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Dict, Any, List
+from redis.exceptions import RedisError
+from sqlalchemy import DateTime, Numeric
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.config import settings
+from app.database.models import User
+from app.database.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Ключи карты пользователей текущего обновления в session.info
+IDENTITY_KEY = "users_by_telegram_id"
+IDENTITY_BY_ID_KEY = "users_by_id"
+
+# Префикс ключей меняется вместе с набором колонок снимка
+KEY_PREFIX = "user:v1"
+
+USER_COLUMNS = tuple(
+    (
+        column.key,
+        Decimal if isinstance(column.type, Numeric)
+        else datetime if isinstance(column.type, DateTime)
+        else None
+    )
+    for column in User.__table__.columns
+)
+
+
+def encode_snapshot(user: User) -> bytes:
+    """Сериализовать пользователя в компактный снимок (значения колонок по порядку)"""
+    values = []
+    for key, kind in USER_COLUMNS:
+        value = getattr(user, key)
+        if value is not None and kind is Decimal:
+            value = str(value)
+        elif value is not None and kind is datetime:
+            value = value.isoformat()
+        values.append(value)
+    return json.dumps(values, separators=(",", ":")).encode()
+
+
+def decode_snapshot(raw: bytes) -> Optional[Dict[str, Any]]:
+    """Разобрать снимок пользователя"""
+    values = json.loads(raw)
+    if len(values) != len(USER_COLUMNS):
+        return None
+
+    snapshot = {}
+    for (key, kind), value in zip(USER_COLUMNS, values):
+        if value is not None and kind is Decimal:
+            value = Decimal(value)
+        elif value is not None and kind is datetime:
+            value = datetime.fromisoformat(value)
+        snapshot[key] = value
+    return snapshot
+
+
+def user_from_snapshot(snapshot: Dict[str, Any]) -> User:
+    """Восстановить отсоединенного пользователя из снимка без запроса к БД"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return user
+
+
+class UserCache:
+    """
+    Общий для всех процессов бота кэш снимков пользователей в Redis
+
+    Снимок хранится под двумя ключами - по telegram_id и по id, чтобы оба
+    способа поиска стоили одного обращения к Redis. Ошибки Redis не ломают
+    работу: запрос просто уходит в базу данных.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    @staticmethod
+    def _telegram_key(telegram_id: int) -> str:
+        return f"{KEY_PREFIX}:tg:{telegram_id}"
+
+    @staticmethod
+    def _id_key(user_id: int) -> str:
+        return f"{KEY_PREFIX}:id:{user_id}"
+
+    async def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = await redis_client.get(key)
+        except RedisError as e:
+            logger.warning(f"User cache read failed: {e}")
+            return None
+
+        return decode_snapshot(raw) if raw is not None else None
+
+    async def get(self, telegram_id: int) -> Optional[Dict[str, Any]]:
+        """Получить снимок пользователя по Telegram ID"""
+        return await self._get(self._telegram_key(telegram_id))
+
+    async def get_by_id(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Получить снимок пользователя по ID"""
+        return await self._get(self._id_key(user_id))
+
+    async def set(self, user: User):
+        """Сохранить снимок пользователя"""
+        raw = encode_snapshot(user)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(self._telegram_key(user.telegram_id), raw, ex=self.ttl)
+                pipe.set(self._id_key(user.id), raw, ex=self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"User cache write failed: {e}")
+
+    async def invalidate(self, user_id: int):
+        """Сбросить снимок пользователя после изменения"""
+        try:
+            raw = await redis_client.getdel(self._id_key(user_id))
+            if raw is not None:
+                snapshot = decode_snapshot(raw)
+                if snapshot is not None:
+                    await redis_client.delete(self._telegram_key(snapshot["telegram_id"]))
+        except RedisError as e:
+            logger.warning(f"User cache invalidation failed: {e}")
+
+    async def invalidate_many(self, user_ids: List[int]):
+        """Сбросить снимки нескольких пользователей за два обращения к Redis"""
+        if not user_ids:
+            return
+
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.getdel(self._id_key(user_id))
+                raws = await pipe.execute()
+
+            telegram_keys = []
+            for raw in raws:
+                snapshot = decode_snapshot(raw) if raw is not None else None
+                if snapshot is not None:
+                    telegram_keys.append(self._telegram_key(snapshot["telegram_id"]))
+
+            if telegram_keys:
+                await redis_client.delete(*telegram_keys)
+        except RedisError as e:
+            logger.warning(f"User cache invalidation failed: {e}")
+
+
+# Глобальный экземпляр кэша пользователей
+user_cache = UserCache(ttl=settings.USER_CACHE_TTL)
@@ -4,31 +4,71 @@
 import secrets
 import string
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, func
 from sqlalchemy.orm import selectinload
 
 from app.database.models import User, Transaction, TransactionType, TransactionStatus
+from app.services.ledger_service import LedgerService
+from app.services.rating_index import rating_index
+from app.utils.pagination import Page, paginate
+from app.services.user_cache import (
+    IDENTITY_KEY, IDENTITY_BY_ID_KEY, user_cache, user_from_snapshot
+)
 
 
 class UserService:
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.ledger = LedgerService(session)
     
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """Получить пользователя по Telegram ID"""
-        result = await self.session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        return result.scalar_one_or_none()
+        # Пользователь уже загружен в рамках текущего обновления
+        user = self.session.info.get(IDENTITY_KEY, {}).get(telegram_id)
+        if user is not None:
+            return user
+        
+        snapshot = await user_cache.get(telegram_id)
+        if snapshot is not None:
+            user = await self.session.merge(user_from_snapshot(snapshot), load=False)
+        else:
+            result = await self.session.execute(
+                select(User).where(User.telegram_id == telegram_id)
+            )
+            user = result.scalar_one_or_none()
+            if user is not None:
+                await user_cache.set(user)
+        
+        if user is not None:
+            self._remember(user)
+        
+        return user
     
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
         """Получить пользователя по ID"""
-        result = await self.session.execute(
-            select(User).where(User.id == user_id)
-        )
-        return result.scalar_one_or_none()
+        user = self.session.info.get(IDENTITY_BY_ID_KEY, {}).get(user_id)
+        if user is not None:
+            return user
+        
+        snapshot = await user_cache.get_by_id(user_id)
+        if snapshot is not None:
+            user = await self.session.merge(user_from_snapshot(snapshot), load=False)
+        else:
+            user = await self.session.get(User, user_id)
+            if user is not None:
+                await user_cache.set(user)
+        
+        if user is not None:
+            self._remember(user)
+        
+        return user
+    
+    def _remember(self, user: User):
+        """Запомнить пользователя в рамках текущего обновления"""
+        self.session.info.setdefault(IDENTITY_KEY, {})[user.telegram_id] = user
+        self.session.info.setdefault(IDENTITY_BY_ID_KEY, {})[user.id] = user
     
     async def create_user(
         self,
@@ -54,6 +94,7 @@ class UserService:
         self.session.add(user)
         await self.session.commit()
         await self.session.refresh(user)
+        await rating_index.update(user.id, user.rating)
         
         # Если есть реферер, начисляем бонус
         if referrer_id:
@@ -61,7 +102,13 @@ class UserService:
         
         return user
     
-    async def update_user_balance(self, user_id: int, amount: float) -> bool:
+    async def update_user_balance(
+        self,
+        user_id: int,
+        amount: float,
+        entry_type: TransactionType,
+        description: Optional[str] = None
+    ) -> bool:
         """Обновить баланс пользователя"""
         try:
             await self.session.execute(
@@ -69,7 +116,9 @@ class UserService:
                 .where(User.id == user_id)
                 .values(balance=User.balance + amount)
             )
+            await self.ledger.post(user_id, amount, entry_type, description)
             await self.session.commit()
+            await user_cache.invalidate(user_id)
             return True
         except Exception as e:
             await self.session.rollback()
@@ -105,22 +154,22 @@ class UserService:
     async def get_user_transactions(
         self,
         user_id: int,
-        limit: int = 50,
-        offset: int = 0
-    ) -> List[Transaction]:
-        """Получить транзакции пользователя"""
-        result = await self.session.execute(
-            select(Transaction)
-            .where(Transaction.user_id == user_id)
-            .order_by(Transaction.created_at.desc())
-            .limit(limit)
-            .offset(offset)
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Page:
+        """Получить страницу транзакций пользователя (от новых к старым)"""
+        return await paginate(
+            self.session,
+            select(Transaction).where(Transaction.user_id == user_id),
+            [Transaction.created_at, Transaction.id],
+            cursor=cursor,
+            limit=limit
         )
-        return result.scalars().all()
     
     async def get_recent_transactions(self, user_id: int, limit: int = 10) -> List[Transaction]:
         """Получить последние транзакции"""
-        return await self.get_user_transactions(user_id, limit)
+        page = await self.get_user_transactions(user_id, limit=limit)
+        return page.items
     
     async def update_user_stats(
         self,
@@ -132,7 +181,7 @@ class UserService:
         rating_change: int = 0
     ):
         """Обновить статистику пользователя"""
-        await self.session.execute(
+        result = await self.session.execute(
             update(User)
             .where(User.id == user_id)
             .values(
@@ -143,8 +192,14 @@ class UserService:
                 rating=User.rating + rating_change,
                 last_active=datetime.utcnow()
             )
+            .returning(User.rating, User.is_banned)
         )
+        row = result.one_or_none()
         await self.session.commit()
+        await user_cache.invalidate(user_id)
+        
+        if row and rating_change:
+            await rating_index.update(user_id, *row)
     
     async def verify_user(self, user_id: int) -> bool:
         """Верифицировать пользователя"""
@@ -155,6 +210,7 @@ class UserService:
                 .values(is_verified=True)
             )
             await self.session.commit()
+            await user_cache.invalidate(user_id)
             return True
         except Exception:
             await self.session.rollback()
@@ -169,6 +225,8 @@ class UserService:
                 .values(is_banned=True)
             )
             await self.session.commit()
+            await user_cache.invalidate(user_id)
+            await rating_index.update(user_id, 0, is_banned=True)
             return True
         except Exception:
             await self.session.rollback()
@@ -177,12 +235,17 @@ class UserService:
     async def unban_user(self, user_id: int) -> bool:
         """Разблокировать пользователя"""
         try:
-            await self.session.execute(
+            result = await self.session.execute(
                 update(User)
                 .where(User.id == user_id)
                 .values(is_banned=False)
+                .returning(User.rating)
             )
+            rating = result.scalar_one_or_none()
             await self.session.commit()
+            await user_cache.invalidate(user_id)
+            if rating is not None:
+                await rating_index.update(user_id, rating)
             return True
         except Exception:
             await self.session.rollback()
@@ -195,6 +258,20 @@ class UserService:
         )
         return result.scalar_one_or_none()
     
+    async def get_display_names(self, user_ids: List[int]) -> Dict[int, str]:
+        """Получить отображаемые имена пользователей по ID"""
+        if not user_ids:
+            return {}
+        
+        result = await self.session.execute(
+            select(User.id, User.username, User.first_name)
+            .where(User.id.in_(set(user_ids)))
+        )
+        return {
+            user_id: f"@{username}" if username else (first_name or str(user_id))
+            for user_id, username, first_name in result.all()
+        }
+    
     async def get_referrals(self, user_id: int) -> List[User]:
         """Получить рефералов пользователя"""
         result = await self.session.execute(
@@ -204,6 +281,15 @@ class UserService:
     
     async def get_top_users(self, limit: int = 10) -> List[User]:
         """Получить топ пользователей по рейтингу"""
+        top = await rating_index.top(limit)
+        
+        if top is not None:
+            user_ids = [user_id for user_id, _ in top]
+            result = await self.session.execute(select(User).where(User.id.in_(user_ids)))
+            users = {user.id: user for user in result.scalars().all()}
+            return [users[user_id] for user_id in user_ids if user_id in users]
+        
+        # Индекс недоступен - читаем по индексу (is_banned, rating)
         result = await self.session.execute(
             select(User)
             .where(User.is_banned == False)
@@ -251,5 +337,11 @@ class UserService:
         )
         
         # Обновляем балансы
-        await self.update_user_balance(new_user_id, 100.0)
-        await self.update_user_balance(referrer_id, 50.0)
+        await self.update_user_balance(
+            new_user_id, 100.0, TransactionType.REFERRAL_BONUS,
+            "Бонус за регистрацию по реферальной ссылке"
+        )
+        await self.update_user_balance(
+            referrer_id, 50.0, TransactionType.REFERRAL_BONUS,
+            "Бонус за приглашение друга"
+        )
@@ -0,0 +1,191 @@
+"""
+Сервис для проверки результатов игр
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+
+from app.database.models import GameSession, GameType, Participant
+from app.games.clicker import ClickerGame
+from app.games.reaction import ReactionTestGame
+from app.games.game_2048 import Game2048
+
+# Сколько игровых сессий отправляется в один процесс за раз
+VALIDATION_CHUNK_SIZE = 500
+
+# Допустимое расхождение сохраненного и пересчитанного счета
+SCORE_TOLERANCE = 0.01
+
+# Игры, которые можно переиграть по сохраненным данным. Результаты остальных
+# игр проверить нечем: они не проверяются и не обнуляются
+VERIFIABLE_GAME_TYPES = (GameType.CLICKER, GameType.REACTION, GameType.GAME_2048)
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Получить общий пул процессов для проверки игр"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _executor
+
+
+def shutdown_executor():
+    """Остановить пул процессов"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def validate_game_data(
+    game_type: str,
+    game_data: Dict[str, Any],
+    duration: float
+) -> Optional[Tuple[bool, float]]:
+    """
+    Переиграть игру по сохраненным данным: (валидна ли, счет)
+
+    duration - длительность партии по серверным меткам сессии.
+    Для игр без проверки возвращает None: результат нельзя ни подтвердить,
+    ни опровергнуть.
+    """
+    if game_type == GameType.CLICKER.value:
+        result = ClickerGame().process_clicks(game_data)
+        return result.is_valid, result.score
+
+    if game_type == GameType.REACTION.value:
+        result = ReactionTestGame().process_results(game_data)
+        return result.is_valid, result.score
+
+    if game_type == GameType.GAME_2048.value:
+        result = Game2048().validate_replay(
+            int(game_data["seed"]),
+            str(game_data.get("moves", "")),
+            duration
+        )
+        return result.is_valid, float(result.final_score)
+
+    # Для остальных игр проверки по данным пока нет
+    return None
+
+
+def validate_chunk(
+    items: List[Tuple[int, str, Optional[str], Optional[float], float]]
+) -> List[Tuple[int, bool]]:
+    """
+    Проверить пачку сессий (выполняется в отдельном процессе)
+
+    Сессии игр без проверки в результат не попадают.
+    """
+    results = []
+
+    for session_id, game_type, raw_data, stored_score, duration in items:
+        try:
+            checked = validate_game_data(game_type, json.loads(raw_data or "{}"), duration)
+        except (ValueError, KeyError, TypeError):
+            checked = False, 0.0
+
+        if checked is None:
+            continue
+        is_valid, score = checked
+
+        # Сохраненный счет должен совпадать с пересчитанным
+        if is_valid and stored_score is not None:
+            is_valid = abs(score - stored_score) <= SCORE_TOLERANCE
+
+        results.append((session_id, is_valid))
+
+    return results
+
+
+class ValidationService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def validate_tournament_sessions(self, tournament_id: int) -> Dict[str, Any]:
+        """
+        Проверить все завершенные игровые сессии турнира
+
+        Сессии читаются потоком пачками и раздаются в пул процессов,
+        результаты записываются по мере готовности пачек. Участники
+        с непрошедшими проверку играми получают нулевой счет; игры без
+        проверки (VERIFIABLE_GAME_TYPES) пропускаются, их счет остается.
+        Транзакция не фиксируется: это делает вызывающий код.
+        """
+        loop = asyncio.get_running_loop()
+        executor = get_executor()
+
+        result = await self.session.stream(
+            select(
+                GameSession.id,
+                GameSession.user_id,
+                GameSession.game_type,
+                GameSession.game_data,
+                GameSession.score,
+                GameSession.started_at,
+                GameSession.completed_at
+            )
+            .where(
+                GameSession.tournament_id == tournament_id,
+                GameSession.is_completed == True,
+                GameSession.game_type.in_(VERIFIABLE_GAME_TYPES)
+            )
+            .execution_options(yield_per=VALIDATION_CHUNK_SIZE)
+        )
+
+        owners: Dict[int, int] = {}
+        futures = []
+
+        async for rows in result.partitions(VALIDATION_CHUNK_SIZE):
+            chunk = []
+            for session_id, user_id, game_type, game_data, score, started_at, completed_at in rows:
+                owners[session_id] = user_id
+                chunk.append((
+                    session_id,
+                    game_type.value,
+                    game_data,
+                    float(score) if score is not None else None,
+                    (completed_at - started_at).total_seconds()
+                ))
+            futures.append(loop.run_in_executor(executor, validate_chunk, chunk))
+
+        valid_count = 0
+        invalid_users = set()
+
+        for future in asyncio.as_completed(futures):
+            chunk_results = await future
+            valid_ids = [session_id for session_id, is_valid in chunk_results if is_valid]
+            invalid_users.update(
+                owners[session_id] for session_id, is_valid in chunk_results if not is_valid
+            )
+
+            if valid_ids:
+                await self.session.execute(
+                    update(GameSession)
+                    .where(GameSession.id.in_(valid_ids))
+                    .values(is_validated=True)
+                )
+                valid_count += len(valid_ids)
+
+        # Дисквалифицируем участников с непрошедшими проверку играми
+        if invalid_users:
+            await self.session.execute(
+                update(Participant)
+                .where(
+                    Participant.tournament_id == tournament_id,
+                    Participant.user_id.in_(invalid_users)
+                )
+                .values(score=0)
+            )
+
+        return {
+            "total": len(owners),
+            "valid": valid_count,
+            "invalid_users": sorted(invalid_users)
+        }
@@ -0,0 +1,108 @@
+"""
+Keyset-пагинация
+
+Страница выбирается условием по ключу сортировки последней показанной
+строки, а не через OFFSET, поэтому любая страница стоит как первая.
+Курсор непрозрачен и помещается в callback_data (до 64 байт).
+"""
+import base64
+import struct
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence, Tuple
+from sqlalchemy import DateTime, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT = 0  # к более старым записям
+PREV = 1  # к более новым записям
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@dataclass
+class Page:
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, datetime):
+        return (value - EPOCH) // timedelta(microseconds=1)
+    return int(value)
+
+
+def _from_int(value: int, column) -> Any:
+    if isinstance(column.type, DateTime):
+        return EPOCH + timedelta(microseconds=value)
+    return value
+
+
+def encode_cursor(direction: int, columns: Sequence, item: Any) -> str:
+    """Закодировать курсор по значениям ключа сортировки строки"""
+    values = [_to_int(getattr(item, column.key)) for column in columns]
+    raw = struct.pack(f">B{len(values)}q", direction, *values)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> Optional[Tuple[int, List[Any]]]:
+    """Разобрать курсор: (направление, значения ключа) или None для битого курсора"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        direction, *values = struct.unpack(f">B{len(columns)}q", raw)
+    except (ValueError, struct.error):
+        return None
+
+    if direction not in (NEXT, PREV):
+        return None
+
+    return direction, [_from_int(value, column) for value, column in zip(values, columns)]
+
+
+async def paginate(
+    session: AsyncSession,
+    query: Select,
+    columns: Sequence,
+    cursor: Optional[str] = None,
+    limit: int = 10
+) -> Page:
+    """
+    Получить страницу запроса, упорядоченного по columns по убыванию
+
+    columns должны однозначно задавать порядок (последней колонкой обычно id).
+    """
+    decoded = decode_cursor(cursor, columns) if cursor else None
+    direction, values = decoded if decoded else (NEXT, None)
+
+    key = tuple_(*columns)
+    if direction == NEXT:
+        if values is not None:
+            query = query.where(key < tuple_(*values))
+        query = query.order_by(*[column.desc() for column in columns])
+    else:
+        query = query.where(key > tuple_(*values))
+        query = query.order_by(*[column.asc() for column in columns])
+
+    result = await session.execute(query.limit(limit + 1))
+    items = list(result.scalars().all())
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    if direction == PREV:
+        items.reverse()
+
+    page = Page(items=items)
+    if not items:
+        return page
+
+    if direction == NEXT:
+        if has_more:
+            page.next_cursor = encode_cursor(NEXT, columns, items[-1])
+        if values is not None:
+            page.prev_cursor = encode_cursor(PREV, columns, items[0])
+    else:
+        if has_more:
+            page.prev_cursor = encode_cursor(PREV, columns, items[0])
+        page.next_cursor = encode_cursor(NEXT, columns, items[-1])
+
+    return page
@@ -0,0 +1,179 @@
+"""
+Начальная схема (таблицы, которые раньше создавал create_all)
+
+Базы, созданные до перехода на миграции и до появления бухгалтерской
+книги, уже содержат эту схему: для них достаточно выполнить
+`alembic stamp 0001`. Таблицы книги создает ревизия 0002.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Enum хранятся в БД по именам членов; типы создаются явно один раз,
+# потому что GameType и TransactionType используются в двух таблицах
+transaction_type = postgresql.ENUM(
+    "DEPOSIT", "WITHDRAWAL", "TOURNAMENT_FEE", "PRIZE", "REFERRAL_BONUS",
+    name="transactiontype", create_type=False
+)
+transaction_status = postgresql.ENUM(
+    "PENDING", "COMPLETED", "FAILED", "CANCELLED",
+    name="transactionstatus", create_type=False
+)
+tournament_type = postgresql.ENUM(
+    "DUEL", "GROUP", "MARATHON",
+    name="tournamenttype", create_type=False
+)
+tournament_status = postgresql.ENUM(
+    "CREATED", "REGISTRATION", "IN_PROGRESS", "COMPLETED", "CANCELLED",
+    name="tournamentstatus", create_type=False
+)
+game_type = postgresql.ENUM(
+    "CLICKER", "REACTION", "GAME_2048", "CHESS", "BACKGAMMON", "CHECKERS",
+    "TETRIS", "MINESWEEPER", "SHOOTING_GALLERY",
+    name="gametype", create_type=False
+)
+
+ENUMS = (
+    transaction_type, transaction_status,
+    tournament_type, tournament_status, game_type
+)
+
+
+def upgrade():
+    bind = op.get_bind()
+    for enum in ENUMS:
+        enum.create(bind, checkfirst=True)
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("username", sa.String(32), nullable=True),
+        sa.Column("first_name", sa.String(64), nullable=True),
+        sa.Column("last_name", sa.String(64), nullable=True),
+        sa.Column("balance", sa.Numeric(10, 2), nullable=False),
+        sa.Column("total_deposits", sa.Numeric(10, 2), nullable=False),
+        sa.Column("total_withdrawals", sa.Numeric(10, 2), nullable=False),
+        sa.Column("total_winnings", sa.Numeric(10, 2), nullable=False),
+        sa.Column("rating", sa.Integer(), nullable=False),
+        sa.Column("games_played", sa.Integer(), nullable=False),
+        sa.Column("games_won", sa.Integer(), nullable=False),
+        sa.Column("tournaments_played", sa.Integer(), nullable=False),
+        sa.Column("tournaments_won", sa.Integer(), nullable=False),
+        sa.Column("is_verified", sa.Boolean(), nullable=False),
+        sa.Column("is_banned", sa.Boolean(), nullable=False),
+        sa.Column("is_premium", sa.Boolean(), nullable=False),
+        sa.Column("referrer_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("referral_code", sa.String(16), nullable=True, unique=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_active", sa.DateTime(), nullable=False),
+        sa.Column("premium_until", sa.DateTime(), nullable=True),
+    )
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+
+    op.create_table(
+        "tournaments",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("creator_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("title", sa.String(128), nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("game_type", game_type, nullable=False),
+        sa.Column("tournament_type", tournament_type, nullable=False),
+        sa.Column("entry_fee", sa.Numeric(10, 2), nullable=False),
+        sa.Column("prize_pool", sa.Numeric(10, 2), nullable=False),
+        sa.Column("platform_commission", sa.Numeric(10, 2), nullable=False),
+        sa.Column("max_participants", sa.Integer(), nullable=False),
+        sa.Column("min_participants", sa.Integer(), nullable=False),
+        sa.Column("prize_distribution", sa.Text(), nullable=True),
+        sa.Column("status", tournament_status, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("registration_ends_at", sa.DateTime(), nullable=True),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("ended_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "participants",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("tournament_id", sa.BigInteger(), sa.ForeignKey("tournaments.id"), nullable=False),
+        sa.Column("final_position", sa.Integer(), nullable=True),
+        sa.Column("score", sa.Numeric(10, 2), nullable=True),
+        sa.Column("winnings", sa.Numeric(10, 2), nullable=False),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("joined_at", sa.DateTime(), nullable=False),
+        sa.Column("left_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("transaction_type", transaction_type, nullable=False),
+        sa.Column("status", transaction_status, nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("external_id", sa.String(128), nullable=True),
+        sa.Column("payment_method", sa.String(32), nullable=True),
+        sa.Column("tournament_id", sa.BigInteger(), sa.ForeignKey("tournaments.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "game_sessions",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("tournament_id", sa.BigInteger(), sa.ForeignKey("tournaments.id"), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("game_type", game_type, nullable=False),
+        sa.Column("game_data", sa.Text(), nullable=True),
+        sa.Column("score", sa.Numeric(10, 2), nullable=True),
+        sa.Column("is_completed", sa.Boolean(), nullable=False),
+        sa.Column("is_validated", sa.Boolean(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "reserve_fund",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("balance", sa.Numeric(10, 2), nullable=False),
+        sa.Column("total_contributions", sa.Numeric(10, 2), nullable=False),
+        sa.Column("total_payouts", sa.Numeric(10, 2), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+    op.create_table(
+        "referral_bonuses",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("referrer_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("referred_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("bonus_amount", sa.Numeric(10, 2), nullable=False),
+        sa.Column("commission_rate", sa.Numeric(5, 4), nullable=False),
+        sa.Column("total_commission", sa.Numeric(10, 2), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("referral_bonuses")
+    op.drop_table("reserve_fund")
+    op.drop_table("game_sessions")
+    op.drop_table("transactions")
+    op.drop_table("participants")
+    op.drop_table("tournaments")
+    op.drop_table("users")
+
+    bind = op.get_bind()
+    for enum in reversed(ENUMS):
+        enum.drop(bind, checkfirst=True)
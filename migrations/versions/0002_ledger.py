@@ -0,0 +1,58 @@
+"""
+Бухгалтерская книга: проводки и снимки балансов
+
+Базы, созданные через create_all уже с книгой, отмечаются этой
+ревизией: `alembic stamp 0002`.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ledger_account = postgresql.ENUM(
+    "USER", "EXTERNAL", "TOURNAMENTS", "BONUSES",
+    name="ledgeraccount", create_type=False
+)
+transaction_type = postgresql.ENUM(name="transactiontype", create_type=False)
+
+
+def upgrade():
+    ledger_account.create(op.get_bind(), checkfirst=True)
+
+    op.create_table(
+        "ledger_entries",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("account", ledger_account, nullable=False),
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("entry_type", transaction_type, nullable=False),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("transaction_id", sa.BigInteger(), sa.ForeignKey("transactions.id"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_ledger_entries_user_id_id", "ledger_entries", ["user_id", "id"])
+
+    op.create_table(
+        "ledger_snapshots",
+        sa.Column("user_id", sa.BigInteger(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("balance", sa.Numeric(12, 2), nullable=False),
+        sa.Column("last_entry_id", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_ledger_snapshots_last_entry_id", "ledger_snapshots", ["last_entry_id"])
+
+
+def downgrade():
+    op.drop_index("ix_ledger_snapshots_last_entry_id", table_name="ledger_snapshots")
+    op.drop_table("ledger_snapshots")
+    op.drop_index("ix_ledger_entries_user_id_id", table_name="ledger_entries")
+    op.drop_table("ledger_entries")
+    ledger_account.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,76 @@
+"""
+Индексы под запросы сервисов
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # До уникального индекса повторные записи об участии могли появиться
+    # при одновременной регистрации; оставляем самую раннюю
+    op.execute(
+        """
+        DELETE FROM participants p
+        USING participants earlier
+        WHERE p.tournament_id = earlier.tournament_id
+          AND p.user_id = earlier.user_id
+          AND p.id > earlier.id
+        """
+    )
+    op.create_index(
+        "uq_participants_tournament_id_user_id", "participants",
+        ["tournament_id", "user_id"], unique=True, if_not_exists=True
+    )
+    op.create_index(
+        "ix_participants_user_id", "participants",
+        ["user_id"], if_not_exists=True
+    )
+
+    op.create_index(
+        "ix_transactions_user_id_type_status", "transactions",
+        ["user_id", "transaction_type", "status"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_transactions_user_id_created_at_id", "transactions",
+        ["user_id", "created_at", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_transactions_pending_withdrawals", "transactions",
+        ["created_at"], if_not_exists=True,
+        postgresql_where=sa.text("transaction_type = 'WITHDRAWAL' AND status = 'PENDING'")
+    )
+
+    op.create_index(
+        "ix_tournaments_status_game_type", "tournaments",
+        ["status", "game_type"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_tournaments_active_created_at_id", "tournaments",
+        ["created_at", "id"], if_not_exists=True,
+        postgresql_where=sa.text("status IN ('REGISTRATION', 'IN_PROGRESS')")
+    )
+
+    op.create_index(
+        "ix_users_is_banned_rating", "users",
+        ["is_banned", "rating"], if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_is_banned_rating", table_name="users")
+    op.drop_index("ix_tournaments_active_created_at_id", table_name="tournaments")
+    op.drop_index("ix_tournaments_status_game_type", table_name="tournaments")
+    op.drop_index("ix_transactions_pending_withdrawals", table_name="transactions")
+    op.drop_index("ix_transactions_user_id_created_at_id", table_name="transactions")
+    op.drop_index("ix_transactions_user_id_type_status", table_name="transactions")
+    op.drop_index("ix_participants_user_id", table_name="participants")
+    op.drop_index("uq_participants_tournament_id_user_id", table_name="participants")
@@ -0,0 +1,38 @@
+"""
+Счетчик участников турнира
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "tournaments",
+        sa.Column("participant_count", sa.Integer(), nullable=False, server_default="0")
+    )
+    op.execute(
+        """
+        UPDATE tournaments t
+        SET participant_count = p.count
+        FROM (
+            SELECT tournament_id, count(*) AS count
+            FROM participants
+            GROUP BY tournament_id
+        ) p
+        WHERE p.tournament_id = t.id
+        """
+    )
+    op.alter_column("tournaments", "participant_count", server_default=None)
+
+
+def downgrade():
+    op.drop_column("tournaments", "participant_count")
@@ -0,0 +1,39 @@
+"""
+Счетчик присланных результатов турнира
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "tournaments",
+        sa.Column("results_count", sa.Integer(), nullable=False, server_default="0")
+    )
+    op.execute(
+        """
+        UPDATE tournaments t
+        SET results_count = p.count
+        FROM (
+            SELECT tournament_id, count(*) AS count
+            FROM participants
+            WHERE score IS NOT NULL
+            GROUP BY tournament_id
+        ) p
+        WHERE p.tournament_id = t.id
+        """
+    )
+    op.alter_column("tournaments", "results_count", server_default=None)
+
+
+def downgrade():
+    op.drop_column("tournaments", "results_count")
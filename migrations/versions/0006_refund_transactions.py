@@ -0,0 +1,24 @@
+"""
+Тип транзакции для возврата взносов
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Новое значение enum нельзя использовать в транзакции, где оно добавлено
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE transactiontype ADD VALUE IF NOT EXISTS 'REFUND'")
+
+
+def downgrade():
+    # PostgreSQL не умеет удалять значения enum
+    pass
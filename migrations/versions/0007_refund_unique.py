@@ -0,0 +1,26 @@
+"""
+Не более одного возврата взноса на участника турнира
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "uq_transactions_refund_tournament_id_user_id", "transactions",
+        ["tournament_id", "user_id"], unique=True, if_not_exists=True,
+        postgresql_where=sa.text("transaction_type = 'REFUND'")
+    )
+
+
+def downgrade():
+    op.drop_index("uq_transactions_refund_tournament_id_user_id", table_name="transactions")
@@ -0,0 +1,37 @@
+"""
+Ключи идемпотентности платежных операций
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "transactions",
+        sa.Column("idempotency_key", sa.String(length=128), nullable=True)
+    )
+    # Повторы external_id означают уже случившееся двойное зачисление:
+    # миграция на них остановится, такие платежи разбираются вручную
+    op.create_index(
+        "uq_transactions_external_id", "transactions",
+        ["external_id"], unique=True, if_not_exists=True
+    )
+    op.create_index(
+        "uq_transactions_idempotency_key", "transactions",
+        ["idempotency_key"], unique=True, if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index("uq_transactions_idempotency_key", table_name="transactions")
+    op.drop_index("uq_transactions_external_id", table_name="transactions")
+    op.drop_column("transactions", "idempotency_key")
@@ -0,0 +1,48 @@
+"""
+Таблица исходящих сообщений (transactional outbox)
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+outbox_status = postgresql.ENUM(
+    "PENDING", "SENT", "FAILED",
+    name="outboxstatus", create_type=False
+)
+
+
+def upgrade():
+    outbox_status.create(op.get_bind(), checkfirst=True)
+
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("kind", sa.String(length=32), nullable=False),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", outbox_status, nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("available_at", sa.DateTime(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        "ix_outbox_pending_available_at", "outbox",
+        ["available_at"],
+        postgresql_where=sa.text("status = 'PENDING'")
+    )
+
+
+def downgrade():
+    op.drop_index("ix_outbox_pending_available_at", table_name="outbox")
+    op.drop_table("outbox")
+    outbox_status.drop(op.get_bind(), checkfirst=True)
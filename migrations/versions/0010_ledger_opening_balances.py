@@ -0,0 +1,36 @@
+"""
+Входящие остатки бухгалтерской книги
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Текущий users.balance становится входящим остатком пользователя:
+    # снимок покрывает все его проводки, записанные до миграции
+    op.execute(
+        """
+        INSERT INTO ledger_snapshots (user_id, balance, last_entry_id, updated_at)
+        SELECT u.id, u.balance, coalesce(max(e.id), 0), now() AT TIME ZONE 'utc'
+        FROM users u
+        LEFT JOIN ledger_entries e ON e.user_id = u.id
+        GROUP BY u.id, u.balance
+        ON CONFLICT (user_id) DO NOTHING
+        """
+    )
+
+    # Снимки больше не ищутся по общей границе last_entry_id
+    op.drop_index("ix_ledger_snapshots_last_entry_id", table_name="ledger_snapshots")
+
+
+def downgrade():
+    op.create_index("ix_ledger_snapshots_last_entry_id", "ledger_snapshots", ["last_entry_id"])
+    # Входящие остатки не отличить от обычных снимков, они остаются
@@ -0,0 +1,76 @@
+"""
+Партия 2048 в клиенте проходит серверную проверку
+"""
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from app.games.game_2048 import Game2048
+
+# Минимальное окружение браузера для скрипта страницы и автоигра:
+# ходы по кругу до конца партии, результат - то, что ушло бы в sendData
+HARNESS = """
+const element = () => ({
+    textContent: '', innerHTML: '',
+    classList: {add() {}, remove() {}},
+    appendChild() {}, addEventListener() {}
+});
+const document = {
+    getElementById: element, createElement: element, addEventListener() {}
+};
+let sent = null;
+const window = {
+    location: {search: ''},
+    Telegram: {WebApp: {ready() {}, expand() {}, sendData(data) { sent = data; }}}
+};
+%s
+const order = [moveLeft, moveUp, moveRight, moveDown];
+for (let i = 0; i < 20000 && !gameOver; i++) {
+    order[i %% 4]();
+    if (i %% 7 === 0) moveLeft();
+}
+console.log(JSON.stringify({sent: JSON.parse(sent), finalScore: score + maxTile * 10 + moves * 5}));
+"""
+
+
+def play_in_client(html: str) -> dict:
+    script = re.search(r"<script>(.*)</script>", html, re.S).group(1)
+    output = subprocess.run(
+        ["node", "-e", HARNESS % script],
+        capture_output=True, text=True, check=True, timeout=60
+    ).stdout
+    return json.loads(output)
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="нужен node")
+def test_client_game_from_issued_seed_validates():
+    game = Game2048()
+    state = game.start_game()
+
+    played = play_in_client(game.generate_webview_html(state["seed"]))
+
+    assert played["sent"]["seed"] == state["seed"]
+    result = game.validate_replay(state["seed"], played["sent"]["moves"])
+    assert result.is_valid
+    assert result.final_score == played["finalScore"]
+
+
+def test_issued_seed_is_embedded_in_page():
+    game = Game2048()
+    state = game.start_game()
+
+    html = game.generate_webview_html(state["seed"])
+
+    assert f"const seed = {state['seed']} >>> 0;" in html
+    assert "__SEED__" not in html
+
+
+def test_game_longer_than_time_limit_is_rejected():
+    game = Game2048()
+    state = game.start_game()
+
+    assert game.validate_replay(state["seed"], "", game.max_time).is_valid
+    assert not game.validate_replay(state["seed"], "", game.max_time + 1).is_valid
@@ -0,0 +1,90 @@
+"""
+Снимки балансов не теряют проводки, зафиксированные не по порядку id
+
+Нужен PostgreSQL: строка подключения в TEST_DATABASE_URL
+(postgresql+asyncpg://...). Таблицы базы пересоздаются.
+"""
+import asyncio
+import os
+from decimal import Decimal
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="нужен TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    os.environ.setdefault("BOT_TOKEN", "0:test")
+
+    from sqlalchemy import select
+
+    from app.database.connection import db
+    from app.database.models import LedgerSnapshot, TransactionType, User
+    from app.services.ledger_service import LedgerService
+
+
+async def post(session, user_id: int, amount: str):
+    await LedgerService(session).post_many(
+        TransactionType.DEPOSIT, [(user_id, Decimal(amount), None)]
+    )
+
+
+async def refresh():
+    async with db.async_session() as session:
+        await LedgerService(session).refresh_snapshots()
+
+
+async def race_two_postings():
+    """
+    Первая проводка получает меньший id, но фиксируется позже второй;
+    между фиксациями снимки обновляются
+    """
+    await db.drop_tables()
+    await db.create_tables()
+
+    try:
+        async with db.async_session() as session:
+            user = User(telegram_id=1)
+            session.add(user)
+            await session.commit()
+            user_id = user.id
+
+        first = db.async_session()
+        await post(first, user_id, "10")
+
+        async def second_posting():
+            async with db.async_session() as session:
+                await post(session, user_id, "5")
+                await session.commit()
+
+        second = asyncio.create_task(second_posting())
+        await asyncio.sleep(0.5)
+        # Вторая проводка ждет блокировку строки пользователя
+        blocked = not second.done()
+
+        await refresh()
+        await first.commit()
+        await first.close()
+        await second
+        await refresh()
+
+        async with db.async_session() as session:
+            snapshot = await session.scalar(
+                select(LedgerSnapshot.balance).where(LedgerSnapshot.user_id == user_id)
+            )
+            balance = await LedgerService(session).get_balance(user_id)
+
+        return blocked, snapshot, balance
+    finally:
+        await db.drop_tables()
+        await db.engine.dispose()
+
+
+def test_concurrent_postings_are_not_skipped_by_snapshots():
+    blocked, snapshot, balance = asyncio.run(race_two_postings())
+
+    assert blocked
+    assert snapshot == Decimal("15")
+    assert balance == Decimal("15")
@@ -0,0 +1,118 @@
+"""
+Отправка результатов турнира
+
+Нужен PostgreSQL: строка подключения в TEST_DATABASE_URL
+(postgresql+asyncpg://...). Таблицы базы пересоздаются.
+"""
+import asyncio
+import os
+from decimal import Decimal
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="нужен TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+    os.environ.setdefault("BOT_TOKEN", "0:test")
+    os.environ["LEADERBOARD_BACKEND"] = "memory"
+
+    from sqlalchemy import select
+
+    from app.database.connection import db
+    from app.database.models import (
+        GameType, Participant, Tournament, TournamentStatus, TournamentType, User
+    )
+    from app.services import tournament_service
+    from app.services.leaderboard import MemoryLeaderboard
+    from app.services.tournament_service import TournamentService
+
+
+@pytest.fixture(autouse=True)
+def fresh_leaderboard(monkeypatch):
+    """Своя таблица результатов на тест: id турниров повторяются после пересоздания"""
+    monkeypatch.setattr(tournament_service, "leaderboard", MemoryLeaderboard())
+
+
+async def submit_twice(
+    tournament_type: "TournamentType",
+    first: float,
+    second: float,
+    status: "TournamentStatus" = None
+):
+    """Турнир на двоих, один участник присылает два результата"""
+    await db.drop_tables()
+    await db.create_tables()
+
+    try:
+        async with db.async_session() as session:
+            user = User(telegram_id=1)
+            session.add(user)
+            await session.flush()
+
+            tournament = Tournament(
+                creator_id=user.id,
+                title="Test",
+                game_type=GameType.CLICKER,
+                tournament_type=tournament_type,
+                entry_fee=Decimal("10"),
+                max_participants=2,
+                participant_count=2,
+                status=status or TournamentStatus.IN_PROGRESS
+            )
+            session.add(tournament)
+            await session.flush()
+
+            session.add(Participant(user_id=user.id, tournament_id=tournament.id))
+            await session.commit()
+
+            service = TournamentService(session)
+            accepted = [
+                await service.submit_game_result(tournament.id, user.id, first, {}),
+                await service.submit_game_result(tournament.id, user.id, second, {})
+            ]
+
+            stored = await session.scalar(
+                select(Participant.score).where(Participant.tournament_id == tournament.id)
+            )
+            results_count = await session.scalar(
+                select(Tournament.results_count).where(Tournament.id == tournament.id)
+            )
+            top = await tournament_service.leaderboard.top(tournament.id)
+
+        return accepted, stored, results_count, top
+    finally:
+        await db.drop_tables()
+        await db.engine.dispose()
+
+
+def test_group_resubmit_replaces_score():
+    accepted, stored, results_count, top = asyncio.run(submit_twice(TournamentType.GROUP, 50, 30))
+
+    assert accepted == [True, True]
+    assert stored == Decimal("30")
+    assert results_count == 1
+    assert top[0][2] == 30
+
+
+def test_marathon_resubmit_keeps_best_score():
+    accepted, stored, results_count, top = asyncio.run(submit_twice(TournamentType.MARATHON, 50, 30))
+
+    assert accepted == [True, True]
+    assert stored == Decimal("50")
+    assert results_count == 1
+    assert top[0][2] == 50
+
+
+@pytest.mark.parametrize("status", ["REGISTRATION", "COMPLETED"])
+def test_result_outside_running_tournament_is_rejected(status):
+    accepted, stored, results_count, top = asyncio.run(
+        submit_twice(TournamentType.GROUP, 50, 30, TournamentStatus[status])
+    )
+
+    assert accepted == [False, False]
+    assert stored is None
+    assert results_count == 0
+    assert top == []